@@ -327,9 +327,16 @@ def save_vps_subscriptions():
 log_write_counter = 0
 LOG_WRITE_THRESHOLD = 10  # 每10条日志写一次文件
 
+# 日志级别过滤：低于 LOG_MIN_LEVEL 的日志直接丢弃（默认DEBUG，即不过滤）
+# 监控热路径配合懒格式化，被过滤的级别连消息字符串都不构建（见 server_monitor._log）
+LOG_LEVEL_ORDER = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+LOG_MIN_LEVEL = LOG_LEVEL_ORDER.get(os.getenv("LOG_MIN_LEVEL", "DEBUG").upper(), 10)
+
 # Add a log entry
 def add_log(level, message, source="system"):
     global logs, log_write_counter
+    if LOG_LEVEL_ORDER.get(level, 20) < LOG_MIN_LEVEL:
+        return
     log_entry = {
         "id": str(uuid.uuid4()),
         "timestamp": datetime.now().isoformat(),
@@ -2380,7 +2387,7 @@ def save_subscriptions():
         # 检查间隔全局强制为5秒，保存时也固定为5秒
         monitor.check_interval = 5
         subscriptions_data = {
-            "subscriptions": monitor.subscriptions,
+            "subscriptions": monitor.subscriptions_list,
             "known_servers": list(monitor.known_servers),
             "check_interval": 5  # 全局固定为5秒
         }
@@ -2595,7 +2602,7 @@ def clear_purchase_history():
 @app.route('/api/monitor/subscriptions', methods=['GET'])
 def get_subscriptions():
     """获取订阅列表"""
-    return jsonify(monitor.subscriptions)
+    return jsonify(monitor.subscriptions_list)
 
 @app.route('/api/monitor/subscriptions', methods=['POST'])
 def add_subscription():
@@ -2655,7 +2662,7 @@ def batch_add_all_servers():
     errors = []
     
     # 获取当前已订阅的服务器列表（避免重复添加）
-    existing_plan_codes = {s.get("planCode") for s in monitor.subscriptions if s.get("planCode")}
+    existing_plan_codes = set(monitor.subscriptions.keys())
     
     for server in server_plans:
         plan_code = server.get("planCode")
@@ -2736,14 +2743,14 @@ def clear_subscriptions():
 @app.route('/api/monitor/subscriptions/<plan_code>/history', methods=['GET'])
 def get_subscription_history(plan_code):
     """获取订阅的历史记录"""
-    subscription = next((s for s in monitor.subscriptions if s["planCode"] == plan_code), None)
+    subscription = monitor.subscriptions.get(plan_code)
     
     if not subscription:
         return jsonify({"status": "error", "message": "订阅不存在"}), 404
     
     history = subscription.get("history", [])
-    # 返回倒序（最新的在前），使用切片避免修改原数组
-    reversed_history = history[::-1]
+    # 返回倒序（最新的在前），转为list避免修改原数据（history为deque）
+    reversed_history = list(reversed(history))
     
     return jsonify({
         "status": "success",
@@ -5007,6 +5014,81 @@ def quick_order():
         add_log("ERROR", f"快速下单错误: {str(e)}", "config_sniper")
         return jsonify({"success": False, "error": str(e)})
 
+@app.route('/api/config-sniper/quick-order-batch', methods=['POST'])
+def quick_order_batch():
+    """批量快速下单 - 监控触发的一批订单一次请求入队（逐单校验价格，统一落盘）"""
+    try:
+        data = request.json
+        orders = data.get('orders') or []
+        if not orders:
+            return jsonify({"success": False, "error": "缺少 orders"}), 400
+
+        # 监控端下单总是带显式options且跳过重复检查（对应 quick-order 的
+        # fromMonitor+skipDuplicateCheck 路径），因此这里只做价格校验+入队
+        results = []
+        queued = 0
+        for order in orders:
+            plancode = order.get('planCode')
+            datacenter = order.get('datacenter')
+            options = order.get('options') or []
+
+            if not plancode or not datacenter:
+                results.append({"planCode": plancode, "datacenter": datacenter,
+                                "success": False, "error": "缺少 planCode 或 datacenter"})
+                continue
+
+            # 先通过临时购物车获取价格，确保该组合可下单（无价格则不支持下单）
+            price_result = _get_server_price_internal(plancode, datacenter, options)
+            with_tax = None
+            if price_result.get("success"):
+                price_payload = price_result.get("price")
+                if isinstance(price_payload, dict):
+                    price_values = price_payload.get("prices")
+                    if isinstance(price_values, dict):
+                        with_tax = price_values.get("withTax")
+            if with_tax in [None, 0, 0.0]:
+                err = price_result.get("error") or "该组合暂无有效价格，暂不支持下单"
+                add_log("WARNING", f"批量快速下单价格校验失败: {plancode}@{datacenter} - {err}", "config_sniper")
+                results.append({"planCode": plancode, "datacenter": datacenter,
+                                "success": False, "error": f"价格校验失败：{err}"})
+                continue
+
+            # 价格校验通过后创建队列项（与 quick-order 相同的队列结构）
+            current_time = datetime.now().isoformat()
+            queue_item = {
+                "id": str(uuid.uuid4()),
+                "planCode": plancode,
+                "datacenter": datacenter,
+                "options": options,
+                "status": "running",
+                "retryCount": 0,
+                "maxRetries": 3,
+                # 快速下单使用更短的重试间隔，加快抢购节奏
+                "retryInterval": 2,
+                "createdAt": current_time,
+                "updatedAt": current_time,
+                "lastCheckTime": 0,
+                "quickOrder": True,  # 标记为快速下单
+                "priority": 100
+            }
+
+            # 将快速下单任务插入队列头部，提高优先级
+            queue.insert(0, queue_item)
+            queued += 1
+            add_log("INFO", f"批量快速下单: {plancode} ({datacenter}) 已加入队列（含税价格: {with_tax}，options: {options}）", "config_sniper")
+            results.append({"planCode": plancode, "datacenter": datacenter, "success": True})
+
+        # 整批只落盘/刷新统计一次
+        if queued:
+            save_data()
+            update_stats()
+
+        return jsonify({"success": True, "queued": queued, "results": results})
+
+    except Exception as e:
+        add_log("ERROR", f"批量快速下单错误: {str(e)}", "config_sniper")
+        return jsonify({"success": False, "error": str(e)})
+
 @app.route('/api/config-sniper/tasks/<task_id>/check', methods=['POST'])
 def check_config_sniper_task(task_id):
     """手动检查单个配置绑定狙击任务"""
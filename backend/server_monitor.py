@@ -3,11 +3,137 @@
 定时检查服务器可用性变化并发送通知
 """
 
+import concurrent.futures
+import inspect
+import os
+import sys
 import threading
 import time
-from datetime import datetime, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import secrets
 import traceback
-import uuid
+
+from api_key_config import API_SECRET_KEY
+
+# 历史记录上限：deque(maxlen=...) 追加时自动淘汰最旧记录，无需切片截断
+HISTORY_MAX_SIZE = 100
+
+# 缓存条目上限：防止options/UUID缓存在高频通知下无限增长（TTL清理之外的兜底）
+CACHE_MAX_ENTRIES = 10000
+
+# 日志级别过滤：与 app.add_log 使用同一环境变量，热路径日志在构建消息字符串前先判级别
+_LOG_LEVEL_ORDER = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+_LOG_MIN_LEVEL = _LOG_LEVEL_ORDER.get(os.getenv("LOG_MIN_LEVEL", "DEBUG").upper(), 10)
+
+# 北京时区：模块加载时解析一次，避免热路径上每次调用都导入/构造 ZoneInfo
+try:
+    from zoneinfo import ZoneInfo  # Python 3.9+
+    _BEIJING_TZ = ZoneInfo("Asia/Shanghai")
+except Exception:
+    # 兼容无zoneinfo环境：使用UTC+8近似
+    _BEIJING_TZ = timezone(timedelta(hours=8))
+
+
+# 数据中心展示名映射：模块级常量，避免每条汇总通知（乃至每个按钮）重建dict字面量
+DC_DISPLAY_MAP = {
+    "gra": "🇫🇷 法国·格拉沃利讷",
+    "rbx": "🇫🇷 法国·鲁贝",
+    "sbg": "🇫🇷 法国·斯特拉斯堡",
+    "bhs": "🇨🇦 加拿大·博舍维尔",
+    "syd": "🇦🇺 澳大利亚·悉尼",
+    "sgp": "🇸🇬 新加坡",
+    "ynm": "🇮🇳 印度·孟买",
+    "waw": "🇵🇱 波兰·华沙",
+    "fra": "🇩🇪 德国·法兰克福",
+    "lon": "🇬🇧 英国·伦敦",
+    "par": "🇫🇷 法国·巴黎",
+    "eri": "🇮🇹 意大利·埃里切",
+    "lim": "🇵🇱 波兰·利马诺瓦",
+    "vin": "🇺🇸 美国·弗吉尼亚",
+    "hil": "🇺🇸 美国·俄勒冈"
+}
+
+# Telegram按钮 callback_data 模板：短ID为base64url字符集，套模板即为合法JSON
+_CB_DATA_TMPL = '{{"a":"add_to_queue","u":"{}"}}'
+
+# 按钮用短名映射
+DC_SHORT_MAP = {
+    "gra": "🇫🇷 Gra",
+    "rbx": "🇫🇷 Rbx",
+    "sbg": "🇫🇷 Sbg",
+    "bhs": "🇨🇦 Bhs",
+    "syd": "🇦🇺 Syd",
+    "sgp": "🇸🇬 Sgp",
+    "ynm": "🇮🇳 Mum",
+    "waw": "🇵🇱 Waw",
+    "fra": "🇩🇪 Fra",
+    "lon": "🇬🇧 Lon",
+    "par": "🇫🇷 Par",
+    "eri": "🇮🇹 Eri",
+    "lim": "🇵🇱 Lim",
+    "vin": "🇺🇸 Vin",
+    "hil": "🇺🇸 Hil"
+}
+
+# Python 3.11+ 的 fromisoformat 原生支持 "Z" 后缀，无需replace分配新字符串
+_FROMISO_ACCEPTS_Z = sys.version_info >= (3, 11)
+
+
+def _parse_iso(iso_ts):
+    """解析ISO时间字符串（兼容 "Z" 后缀；本程序自产的时间戳无后缀，走零分配路径）"""
+    if not _FROMISO_ACCEPTS_Z and iso_ts.endswith("Z"):
+        iso_ts = iso_ts[:-1] + "+00:00"
+    return datetime.fromisoformat(iso_ts)
+
+
+def _history_ts_unix(entry):
+    """
+    返回历史记录条目的unix时间戳
+
+    新记录直接携带ts_unix；旧的持久化记录只有ISO字符串，解析一次作为回退
+    （仅在订阅恢复等冷路径执行，热路径历时计算只做浮点减法）。
+    """
+    ts = entry.get("ts_unix")
+    if ts is not None:
+        return ts
+    iso_ts = entry.get("timestamp")
+    if not iso_ts:
+        return None
+    try:
+        start_dt = _parse_iso(iso_ts)
+        # 若解析为naive时间，视为北京时间
+        if start_dt.tzinfo is None:
+            start_dt = start_dt.replace(tzinfo=_BEIJING_TZ)
+        return start_dt.timestamp()
+    except Exception:
+        return None
+
+
+def _normalize_status(status):
+    """将状态归一化为 none / available / unavailable / price_check_failed 四类"""
+    if status is None:
+        return "none"
+    if status in ("unavailable", "price_check_failed"):
+        return status
+    return "available"
+
+
+# 状态变迁表：(旧状态, 新状态) -> change_type，查不到表示无需通知
+# 替代原先分散在两处的 if/elif 阶梯，每个 (dc, config) 组合只做一次dict查找
+_TRANSITION_TABLE = {
+    ("none", "available"): "available",
+    ("none", "unavailable"): "unavailable",
+    ("none", "price_check_failed"): "price_check_failed",
+    ("unavailable", "available"): "available",
+    ("unavailable", "price_check_failed"): "price_check_failed",
+    ("price_check_failed", "available"): "available",
+    ("price_check_failed", "unavailable"): "unavailable",
+    ("available", "unavailable"): "unavailable",
+    ("available", "price_check_failed"): "price_check_failed",
+}
 
 
 class ServerMonitor:
@@ -25,12 +151,31 @@ class ServerMonitor:
         self.check_availability = check_availability_func
         self.send_notification = send_notification_func
         self.add_log = add_log_func
+
+        # 通知函数是否支持reply_markup参数：初始化时检查一次
+        # （inspect.signature 每次要重建签名对象，不能放在发送热路径）
+        try:
+            self._send_supports_reply_markup = (
+                'reply_markup' in inspect.signature(send_notification_func).parameters
+            )
+        except (TypeError, ValueError):
+            self._send_supports_reply_markup = False
+
+        # 带按钮的发送入口在此一次性解析：热路径直接调用，无需逐次分支/try回退
+        if self._send_supports_reply_markup:
+            self._send_alert = lambda message, reply_markup=None: send_notification_func(
+                message, reply_markup=reply_markup
+            )
+        else:
+            # 不支持reply_markup的实现：忽略按钮，仅发送文字消息
+            self._send_alert = lambda message, reply_markup=None: send_notification_func(message)
         
-        self.subscriptions = []  # 订阅列表
+        self.subscriptions = {}  # 订阅字典：key = planCode，value = 订阅对象（O(1)查找/删除）
         self.known_servers = set()  # 已知服务器集合
         self.running = False  # 运行状态
         self.check_interval = 5  # 检查间隔（秒），默认5秒
         self.thread = None
+        self._stop_event = threading.Event()  # 停止信号：用于可中断的间隔等待
         
         # Options 缓存：key = f"{plan_code}|{datacenter}"，value = {"options": list, "timestamp": float}
         # 用于在 Telegram callback_data 中 options 丢失时恢复（旧机制，保留兼容性）
@@ -41,35 +186,166 @@ class ServerMonitor:
         # 用于通过UUID恢复完整的下单配置信息
         self.message_uuid_cache = {}
         self.message_uuid_cache_ttl = 24 * 3600  # 缓存有效期：24小时（秒）
+
+        # 价格缓存：key = (plan_code, datacenter, tuple(sorted(options)))，value = (价格文本, timestamp)
+        # 价格变化以小时/天计，短TTL内重复通知直接命中内存，省掉内部API往返
+        self._price_cache = {}
+        self._price_cache_ttl = 15 * 60  # 缓存有效期：15分钟（秒）
         
-        # ✅ 添加线程锁保护缓存操作的并发安全
+        # ✅ 缓存锁：仅用于"读取-判断-删除"/批量清理等多步复合操作
+        # （CPython的GIL保证单次dict读写原子，单操作无需加锁串行化）
         self._cache_lock = threading.Lock()
+
+        # 线程池在 stop() 中关闭、start() 中按需重建（executor关闭后不可复用）
+        self._pools_closed = False
+        self._create_pools()
+
+        # 内部API共享会话：HTTP keep-alive + 连接池，避免每次请求重建TCP连接
+        self._http_session = requests.Session()
+        self._http_session.mount(
+            "http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+        )
         
         self.add_log("INFO", "服务器监控器初始化完成", "monitor")
-    
-    def _limit_history_size(self, subscription, max_size=100):
+
+    @property
+    def subscriptions_list(self):
+        """返回订阅列表（供外部遍历/序列化使用，剔除内部缓存字段，history转为普通list）"""
+        result = []
+        for sub in self.subscriptions.values():
+            item = {k: v for k, v in sub.items() if not k.startswith("_")}
+            item["history"] = list(sub.get("history", []))
+            result.append(item)
+        return result
+
+    def _update_history_index(self, subscription, dc, change_type, config_info, entry):
         """
-        限制订阅历史记录数量，保留最近N条
-        
+        维护 (机房, 配置显示文本) -> 最近一次有货/无货unix时间戳 的索引
+
+        历时计算按索引O(1)取值并直接做浮点减法，避免每次通知都反向扫描
+        最多100条历史记录并解析ISO时间。索引随历史记录追加同步更新，
+        订阅恢复时从持久化的历史记录重建。
+        """
+        ts_unix = _history_ts_unix(entry)
+        if ts_unix is None:
+            return
+        key = (dc, config_info.get("display") if config_info else None)
+        if change_type == "available":
+            subscription.setdefault("_last_available", {})[key] = ts_unix
+        elif change_type in ("unavailable", "price_check_failed"):
+            subscription.setdefault("_last_unavailable", {})[key] = ts_unix
+
+    def _append_history(self, subscription, dc, status, change_type, old_status, config_info=None):
+        """
+        追加一条历史记录并同步维护历时索引
+
+        统一各通知路径的记录结构（ISO时间 + unix时间戳，可选配置信息），
+        数量上限由deque(maxlen)自动维护。
+
         Args:
             subscription: 订阅对象
-            max_size: 最大历史记录数量，默认100
+            dc: 数据中心
+            status: 当前状态
+            change_type: 变化类型
+            old_status: 旧状态
+            config_info: 配置信息（可选）
         """
         if "history" not in subscription:
-            subscription["history"] = []
-        
-        if len(subscription["history"]) > max_size:
-            subscription["history"] = subscription["history"][-max_size:]
-    
+            subscription["history"] = deque(maxlen=HISTORY_MAX_SIZE)
+        # 只取一次当前时间，ISO串与unix时间戳保证来自同一时刻
+        now = self._now_beijing()
+        history_entry = {
+            "timestamp": now.isoformat(),
+            "ts_unix": now.timestamp(),
+            "datacenter": dc,
+            "status": status,
+            "changeType": change_type,
+            "oldStatus": old_status
+        }
+        if config_info:
+            history_entry["config"] = config_info
+        subscription["history"].append(history_entry)
+        self._update_history_index(subscription, dc, change_type, config_info, history_entry)
+
+    def _create_pools(self):
+        """创建价格获取/订阅检查线程池"""
+        # 价格获取线程池：复用线程，避免每次通知都新建/销毁线程
+        self._price_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=8, thread_name_prefix="PriceFetch"
+        )
+
+        # 订阅检查线程池：并发检查各订阅，单轮耗时取决于最慢的订阅而非所有订阅之和
+        # （worker数量同时起到限流作用，避免同时发出过多可用性请求）
+        self._check_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="MonitorCheck"
+        )
+
     def _now_beijing(self) -> datetime:
         """返回北京时间（Asia/Shanghai）的当前时间。"""
-        try:
-            from zoneinfo import ZoneInfo  # Python 3.9+
-            return datetime.now(ZoneInfo("Asia/Shanghai"))
-        except Exception:
-            # 兼容无zoneinfo环境：使用UTC+8近似
-            return datetime.utcnow() + timedelta(hours=8)
-    
+        return datetime.now(_BEIJING_TZ)
+
+    def _log(self, level, fmt, *args, source="monitor"):
+        """
+        懒格式化日志：级别被 LOG_MIN_LEVEL 过滤时直接返回，不构建消息字符串
+
+        热路径上每个tick都会产生的日志走此方法，传格式串与参数
+        （printf风格），只有级别通过时才执行 fmt % args。
+        """
+        if _LOG_LEVEL_ORDER.get(level, 20) < _LOG_MIN_LEVEL:
+            return
+        self.add_log(level, fmt % args if args else fmt, source)
+
+    @staticmethod
+    def _cache_put(cache, key, value, max_entries=CACHE_MAX_ENTRIES):
+        """
+        写入缓存并限制条目数：超出上限时按插入顺序淘汰最旧条目（dict保持插入序）
+
+        Args:
+            cache: 缓存字典
+            key: 缓存键
+            value: 缓存值
+            max_entries: 最大条目数，默认CACHE_MAX_ENTRIES
+        """
+        cache[key] = value
+        while len(cache) > max_entries:
+            cache.pop(next(iter(cache)), None)
+
+    @staticmethod
+    def _classify_change(old_status, new_status):
+        """
+        根据(旧状态, 新状态)查表判定变化类型
+
+        Returns:
+            str: change_type（"available"/"unavailable"/"price_check_failed"），无需通知时返回None
+        """
+        return _TRANSITION_TABLE.get(
+            (_normalize_status(old_status), _normalize_status(new_status))
+        )
+
+    @staticmethod
+    def _format_duration(total_sec):
+        """
+        将秒数格式化为"历时 X天X小时X分X秒"文本（单次遍历拼接，省略为0的高位单位）
+
+        Args:
+            total_sec: 总秒数（int）
+
+        Returns:
+            str: 格式化后的历时文本
+        """
+        days, rem = divmod(total_sec, 86400)
+        hours, rem = divmod(rem, 3600)
+        minutes, seconds = divmod(rem, 60)
+        parts = []
+        if days > 0:
+            parts.append(f"{days}天")
+        if parts or hours > 0:
+            parts.append(f"{hours}小时")
+        if parts or minutes > 0:
+            parts.append(f"{minutes}分")
+        parts.append(f"{seconds}秒")
+        return "历时 " + "".join(parts)
+
     def add_subscription(self, plan_code, datacenters=None, notify_available=True, notify_unavailable=False, server_name=None, last_status=None, history=None, auto_order=False, quantity=1):
         """
         添加服务器订阅
@@ -85,11 +361,13 @@ class ServerMonitor:
             auto_order: 是否自动下单
             quantity: 自动下单数量（每个配置×每个数据中心的数量）
         """
-        # 检查是否已存在
-        existing = next((s for s in self.subscriptions if s["planCode"] == plan_code), None)
+        # 检查是否已存在（dict按planCode索引，O(1)查找）
+        existing = self.subscriptions.get(plan_code)
         if existing:
             self.add_log("WARNING", f"订阅已存在: {plan_code}，将更新配置（不会重置状态，避免重复通知）", "monitor")
             existing["datacenters"] = datacenters or []
+            # 预计算机房过滤集合：热路径中 O(1) 判断 dc 是否被监控
+            existing["_datacenters_set"] = frozenset(datacenters) if datacenters else None
             existing["notifyAvailable"] = notify_available
             existing["notifyUnavailable"] = notify_unavailable
             # 更新自动下单标记和数量
@@ -103,18 +381,23 @@ class ServerMonitor:
             existing["serverName"] = server_name
             # 确保历史记录字段存在
             if "history" not in existing:
-                existing["history"] = []
+                existing["history"] = deque(maxlen=HISTORY_MAX_SIZE)
             # ✅ 不重置 lastStatus，保留已知状态，避免重复通知
             return
         
         subscription = {
             "planCode": plan_code,
             "datacenters": datacenters or [],
+            # 预计算机房过滤集合：热路径中 O(1) 判断 dc 是否被监控（None表示监控全部）
+            "_datacenters_set": frozenset(datacenters) if datacenters else None,
+            # 历时索引：(机房, 配置显示文本) -> 最近一次有货/无货的时间
+            "_last_available": {},
+            "_last_unavailable": {},
             "notifyAvailable": notify_available,
             "notifyUnavailable": notify_unavailable,
             "lastStatus": last_status if last_status is not None else {},  # 恢复上次状态或初始化为空
             "createdAt": datetime.now().isoformat(),
-            "history": history if history is not None else []  # 恢复历史记录或初始化为空
+            "history": deque(history or [], maxlen=HISTORY_MAX_SIZE)  # 恢复历史记录或初始化为空，追加时自动淘汰最旧
         }
         # 自动下单标记和数量
         if auto_order:
@@ -124,29 +407,72 @@ class ServerMonitor:
         # 添加服务器名称（如果提供）
         if server_name:
             subscription["serverName"] = server_name
-        
-        self.subscriptions.append(subscription)
+
+        # 从恢复的历史记录重建历时索引（冷路径，仅在添加/恢复订阅时执行一次）
+        for entry in subscription["history"]:
+            self._update_history_index(
+                subscription, entry.get("datacenter"), entry.get("changeType"),
+                entry.get("config"), entry
+            )
+
+        self.subscriptions[plan_code] = subscription
         
         display_name = f"{plan_code} ({server_name})" if server_name else plan_code
         self.add_log("INFO", f"添加订阅: {display_name}, 数据中心: {datacenters or '全部'}", "monitor")
     
     def remove_subscription(self, plan_code):
         """删除订阅"""
-        original_count = len(self.subscriptions)
-        self.subscriptions = [s for s in self.subscriptions if s["planCode"] != plan_code]
-        
-        if len(self.subscriptions) < original_count:
+        if self.subscriptions.pop(plan_code, None) is not None:
             self.add_log("INFO", f"删除订阅: {plan_code}", "monitor")
             return True
         return False
-    
+
     def clear_subscriptions(self):
         """清空所有订阅"""
         count = len(self.subscriptions)
-        self.subscriptions = []
+        self.subscriptions.clear()
         self.add_log("INFO", f"清空所有订阅 ({count} 项)", "monitor")
         return count
-    
+
+    @staticmethod
+    def _flatten_availability(current_availability):
+        """
+        将嵌套的可用性结构拍平为按配置分组的扁平元组列表
+
+        每个元素为 (config_key, config_info, rows)：
+          - 配置级数据：config_info为配置信息dict，rows为[(status_key, dc, status), ...]
+          - 旧版纯机房状态：config_info为None，rows为[(dc, dc, status)]
+        status_key在拍平阶段一次性拼好，主循环只做元组解包，
+        内层不再有多级dict查找与f-string拼接
+
+        Args:
+            current_availability: check_availability 返回的嵌套结构
+
+        Returns:
+            list: [(config_key, config_info, rows), ...]
+        """
+        flat = []
+        for config_key, config_data in current_availability.items():
+            # 如果是简单的数据中心状态（旧版兼容）
+            if isinstance(config_data, str):
+                flat.append((config_key, None, [(config_key, config_key, config_data)]))
+            # 如果是配置级别的数据（新版配置监控）
+            elif isinstance(config_data, dict) and "datacenters" in config_data:
+                memory = config_data.get("memory", "N/A")
+                storage = config_data.get("storage", "N/A")
+                config_info = {
+                    "memory": memory,
+                    "storage": storage,
+                    "display": f"{memory} + {storage}",
+                    "options": config_data.get("options", [])  # 包含API2格式的选项代码
+                }
+                rows = [
+                    (f"{dc}|{config_key}", dc, status)
+                    for dc, status in config_data["datacenters"].items()
+                ]
+                flat.append((config_key, config_info, rows))
+        return flat
+
     def check_availability_change(self, subscription):
         """
         检查单个订阅的可用性变化（配置级别监控）
@@ -165,54 +491,52 @@ class ServerMonitor:
             
             last_status = subscription.get("lastStatus", {})
             monitored_dcs = subscription.get("datacenters", [])
+            # 预计算的机房过滤集合（None表示监控全部），成员判断为O(1)
+            dc_filter = subscription.get("_datacenters_set")
+
+            # 调试日志（每tick必经，懒格式化避免级别被过滤时白白构建字符串）
+            self._log("INFO", "订阅 %s - 监控数据中心: %s", plan_code, monitored_dcs if monitored_dcs else "全部")
+            self._log("INFO", "订阅 %s - 当前发现 %s 个配置组合", plan_code, len(current_availability))
             
-            # 调试日志
-            self.add_log("INFO", f"订阅 {plan_code} - 监控数据中心: {monitored_dcs if monitored_dcs else '全部'}", "monitor")
-            self.add_log("INFO", f"订阅 {plan_code} - 当前发现 {len(current_availability)} 个配置组合", "monitor")
-            
-            # 遍历当前所有配置组合
-            for config_key, config_data in current_availability.items():
-                # config_key 格式: "plancode.memory.storage" 或 "datacenter"
-                # config_data 格式: {"datacenters": {"dc1": "status1", ...}, "memory": "xxx", "storage": "xxx"}
-                
+            # 遍历当前所有配置组合（先收集通知，价格获取与发送在遍历后批量进行）
+            # ✅ 新状态表在遍历时顺便填充，避免遍历结束后再重走一遍 current_availability
+            # ✅ 嵌套dict先拍平为扁平元组序列，主循环只做元组解包（见 _flatten_availability）
+            pending_configs = []
+            new_last_status = {}
+            for config_key, config_info, rows in self._flatten_availability(current_availability):
                 # 如果是简单的数据中心状态（旧版兼容）
-                if isinstance(config_data, str):
-                    dc = config_key
-                    status = config_data
-                    
-                    # 如果指定了数据中心列表，只监控列表中的
-                    if monitored_dcs and dc not in monitored_dcs:
-                        continue
-                    
-                    old_status = last_status.get(dc)
-                    self._check_and_notify_change(subscription, plan_code, dc, status, old_status, None, dc)
-                
-                # 如果是配置级别的数据（新版配置监控）
-                elif isinstance(config_data, dict) and "datacenters" in config_data:
-                    memory = config_data.get("memory", "N/A")
-                    storage = config_data.get("storage", "N/A")
-                    config_display = f"{memory} + {storage}"
-                    
-                    self.add_log("INFO", f"检查配置: {config_display}", "monitor")
-                    
-                    # 准备配置信息
-                    config_info = {
-                        "memory": memory,
-                        "storage": storage,
-                        "display": config_display,
-                        "options": config_data.get("options", [])  # 包含API2格式的选项代码
-                    }
-                    
+                if config_info is None:
+                    for status_key, dc, status in rows:
+                        # 记录新状态（含未监控机房，保持完整状态表）
+                        new_last_status[dc] = status
+
+                        # 如果指定了数据中心列表，只监控列表中的
+                        if dc_filter and dc not in dc_filter:
+                            continue
+
+                        old_status = last_status.get(dc)
+                        self._check_and_notify_change(subscription, plan_code, dc, status, old_status, None, dc)
+                else:
+                    # 配置级别的数据（新版配置监控）
+                    config_display = config_info["display"]
+                    # 配置描述为循环不变量，每配置构建一次（不再在每个机房/每个分支里重建）
+                    config_desc = f" [{config_display}]" if config_display else ""
+
+                    self._log("INFO", "检查配置: %s", config_display)
+
+                    # 记录新状态（含未监控机房，保持完整状态表）
+                    for status_key, dc, status in rows:
+                        new_last_status[status_key] = status
+
+                    # 机房过滤提前做：重逻辑循环只遍历监控中的机房，
+                    # 监控子集远小于机房总数时整块跳过非候选行
+                    if dc_filter is not None:
+                        rows = [r for r in rows if r[1] in dc_filter]
+
                     # 先收集所有需要发送通知的数据中心
                     # ✅ 关键修改：只有价格校验通过才算真正有货
                     notifications_to_send = []
-                    for dc, status in config_data["datacenters"].items():
-                        # 如果指定了数据中心列表，只监控列表中的
-                        if monitored_dcs and dc not in monitored_dcs:
-                            continue
-                        
-                        # 使用配置作为key来追踪状态
-                        status_key = f"{dc}|{config_key}"
+                    for status_key, dc, status in rows:
                         old_status = last_status.get(status_key)
                         
                         # ✅ 关键修改：如果可用性显示有货（status != "unavailable"），需要先进行价格校验
@@ -227,84 +551,26 @@ class ServerMonitor:
                                 # 价格校验失败，使用特殊状态值标记，避免与真正的无货混淆
                                 actual_status = "price_check_failed"  # 使用特殊状态值
                                 price_check_failed = True  # 标记价格校验失败
-                                config_desc = f" [{config_display}]" if config_display else ""
                                 error_msg = f"，原因: {price_check_error}" if price_check_error else ""
                                 self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 可用性显示有货但价格校验失败{error_msg}，标记为price_check_failed（将触发通知但不自动下单）", "monitor")
                             else:
                                 # 价格校验通过，真正有货
                                 actual_status = "available"
-                                config_desc = f" [{config_display}]" if config_display else ""
                                 self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 可用性有货且价格校验通过，确认有货", "monitor")
                         
-                        # 检查是否需要发送通知（包括首次检查）
+                        # 检查是否需要发送通知（查表判定状态变迁，包括首次检查）
                         status_changed = False
-                        change_type = None
-                        
-                        # 首次检查时也发送通知（如果配置允许）
-                        if old_status is None:
-                            config_desc = f" [{config_display}]" if config_display else ""
-                            if actual_status == "price_check_failed":
-                                # 价格校验失败，触发通知（说明可用性有货但价格校验失败）
-                                self.add_log("INFO", f"首次检查: {plan_code}@{dc}{config_desc} 可用性有货但价格校验失败，发送通知", "monitor")
-                                if subscription.get("notifyAvailable", True):
-                                    status_changed = True
-                                    change_type = "price_check_failed"  # 特殊类型：价格校验失败
-                            elif actual_status == "unavailable":
-                                # 普通无货情况
-                                self.add_log("INFO", f"首次检查: {plan_code}@{dc}{config_desc} 无货", "monitor")
-                                # 首次检查无货时不通知（除非用户明确要求）
-                                if subscription.get("notifyUnavailable", False):
-                                    status_changed = True
-                                    change_type = "unavailable"
+                        change_type = self._classify_change(old_status, actual_status)
+                        if change_type is not None:
+                            # unavailable通知默认关闭，其余（available/price_check_failed）默认开启
+                            if change_type == "unavailable":
+                                notify_enabled = subscription.get("notifyUnavailable", False)
                             else:
-                                # 首次检查有货时发送通知
-                                self.add_log("INFO", f"首次检查: {plan_code}@{dc}{config_desc} 有货（价格校验通过），发送通知", "monitor")
-                                if subscription.get("notifyAvailable", True):
-                                    status_changed = True
-                                    change_type = "available"
-                        # 从无货变有货（价格校验通过）
-                        elif old_status == "unavailable" and actual_status == "available":
-                            if subscription.get("notifyAvailable", True):
-                                status_changed = True
-                                change_type = "available"
-                                config_desc = f" [{config_display}]" if config_display else ""
-                                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从无货变有货（价格校验通过）", "monitor")
-                                # ✅ 补货历时时间将在后续统一计算并添加到通知中
-                        # 从无货变价格校验失败（可用性有货但价格校验失败）
-                        elif old_status == "unavailable" and actual_status == "price_check_failed":
-                            self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从无货变可用性有货但价格校验失败，发送通知", "monitor")
-                            if subscription.get("notifyAvailable", True):
-                                status_changed = True
-                                change_type = "price_check_failed"  # 特殊类型：价格校验失败
-                        # 从价格校验失败变有货（价格校验通过）
-                        elif old_status == "price_check_failed" and actual_status == "available":
-                            if subscription.get("notifyAvailable", True):
-                                status_changed = True
-                                change_type = "available"
-                                config_desc = f" [{config_display}]" if config_display else ""
-                                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从价格校验失败变有货（价格校验通过）", "monitor")
-                        # 从价格校验失败变无货（真正的无货）
-                        elif old_status == "price_check_failed" and actual_status == "unavailable":
-                            if subscription.get("notifyUnavailable", False):
+                                notify_enabled = subscription.get("notifyAvailable", True)
+                            if notify_enabled:
                                 status_changed = True
-                                change_type = "unavailable"
-                                config_desc = f" [{config_display}]" if config_display else ""
-                                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从价格校验失败变无货", "monitor")
-                        # 从有货变无货或价格校验失败
-                        elif old_status == "available" and actual_status in ["unavailable", "price_check_failed"]:
-                            if actual_status == "unavailable":
-                                if subscription.get("notifyUnavailable", False):
-                                    status_changed = True
-                                    change_type = "unavailable"
-                                    config_desc = f" [{config_display}]" if config_display else ""
-                                    self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从有货变无货", "monitor")
-                            else:  # price_check_failed
-                                # 从有货变价格校验失败（可用性有货但价格校验失败）
-                                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从有货变可用性有货但价格校验失败，发送通知", "monitor")
-                                if subscription.get("notifyAvailable", True):
-                                    status_changed = True
-                                    change_type = "price_check_failed"
-                        
+                                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 状态变化: {old_status if old_status is not None else '首次检查'} -> {actual_status}，触发{change_type}通知", "monitor")
+
                         if status_changed:
                             notification_item = {
                                 "dc": dc,
@@ -320,52 +586,18 @@ class ServerMonitor:
                                 # 计算补货历时时间（从上次无货到本次有货的时间）
                                 duration_text = None
                                 try:
-                                    # 查找最近一次无货的时间
-                                    last_unavailable_ts = None
+                                    # 查找最近一次无货的时间（索引O(1)查询，替代历史记录反向扫描）
                                     same_config_display = config_info.get("display") if config_info else None
-                                    for entry in reversed(subscription.get("history", [])):
-                                        if entry.get("datacenter") != dc:
-                                            continue
-                                        if entry.get("changeType") not in ["unavailable", "price_check_failed"]:
-                                            continue
-                                        if same_config_display:
-                                            cfg = entry.get("config", {})
-                                            if cfg.get("display") != same_config_display:
-                                                continue
-                                        last_unavailable_ts = entry.get("timestamp")
-                                        if last_unavailable_ts:
-                                            break
-                                    
+                                    last_unavailable_ts = subscription.get("_last_unavailable", {}).get(
+                                        (dc, same_config_display)
+                                    )
+
                                     if last_unavailable_ts:
-                                        # 解析ISO时间，按北京时间计算时长
-                                        from datetime import datetime as _dt
-                                        try:
-                                            start_dt = _dt.fromisoformat(last_unavailable_ts.replace("Z", "+00:00"))
-                                        except Exception:
-                                            start_dt = _dt.fromisoformat(last_unavailable_ts)
-                                        if start_dt.tzinfo is None:
-                                            try:
-                                                from zoneinfo import ZoneInfo
-                                                start_dt = start_dt.replace(tzinfo=ZoneInfo("Asia/Shanghai"))
-                                            except Exception:
-                                                pass
-                                        delta = self._now_beijing() - start_dt
-                                        total_sec = int(delta.total_seconds())
+                                        # 索引存unix时间戳，历时计算只需一次浮点减法（无ISO解析/时区处理）
+                                        total_sec = int(time.time() - last_unavailable_ts)
                                         if total_sec < 0:
                                             total_sec = 0
-                                        days = total_sec // 86400
-                                        rem = total_sec % 86400
-                                        hours = rem // 3600
-                                        minutes = (rem % 3600) // 60
-                                        seconds = rem % 60
-                                        if days > 0:
-                                            duration_text = f"历时 {days}天{hours}小时{minutes}分{seconds}秒"
-                                        elif hours > 0:
-                                            duration_text = f"历时 {hours}小时{minutes}分{seconds}秒"
-                                        elif minutes > 0:
-                                            duration_text = f"历时 {minutes}分{seconds}秒"
-                                        else:
-                                            duration_text = f"历时 {seconds}秒"
+                                        duration_text = self._format_duration(total_sec)
                                 except Exception as e:
                                     self.add_log("DEBUG", f"计算补货历时异常: {str(e)}", "monitor")
                                     duration_text = None
@@ -378,8 +610,7 @@ class ServerMonitor:
                         # 更新状态记录（使用实际状态，包括特殊状态值 "price_check_failed"）
                         last_status[status_key] = actual_status
                     
-                    # 对于同一个配置，只查询一次价格（使用第一个有货的数据中心）
-                    price_text = None
+                    # 收集本配置的通知；价格查询在遍历结束后统一并发执行（见下方批量获取）
                     if notifications_to_send:
                         # 找出第一个有货的数据中心用于价格查询
                         first_available_dc = None
@@ -388,338 +619,246 @@ class ServerMonitor:
                                 first_available_dc = notif["dc"]
                                 break
                         
-                        # 如果有有货的数据中心，查询价格
-                        if first_available_dc:
-                            try:
-                                import threading
-                                import queue
-                                price_queue = queue.Queue()
-                                
-                                def fetch_price():
-                                    try:
-                                        price_result = self._get_price_info(plan_code, first_available_dc, config_info)
-                                        price_queue.put(price_result)
-                                    except Exception as e:
-                                        self.add_log("WARNING", f"价格获取线程异常: {str(e)}", "monitor")
-                                        price_queue.put(None)
-                                
-                                # 启动价格获取线程
-                                price_thread = threading.Thread(
-                                    target=fetch_price, 
-                                    daemon=True,
-                                    name=f"PriceFetch-{plan_code}-{first_available_dc}"
-                                )
-                                price_thread.start()
-                                start_time = time.time()
-                                price_thread.join(timeout=30.0)  # 最多等待30秒
-                                elapsed_time = time.time() - start_time
-                                
-                                if price_thread.is_alive():
-                                    # ✅ 线程超时，记录详细信息（daemon线程会在主程序退出时自动结束）
-                                    self.add_log("WARNING", 
-                                        f"价格获取超时（已等待{elapsed_time:.1f}秒，线程ID: {price_thread.ident}），"
-                                        f"发送不带价格的通知。daemon线程将在后台继续运行直到完成。", 
-                                        "monitor")
-                                    price_text = None
-                                else:
-                                    # 线程已完成，尝试获取结果
-                                    try:
-                                        price_text = price_queue.get_nowait()
-                                    except queue.Empty:
-                                        price_text = None
-                                        self.add_log("WARNING", 
-                                            f"价格获取线程已完成但队列为空（耗时{elapsed_time:.1f}秒）", 
-                                            "monitor")
-                                
-                                if price_text:
-                                    self.add_log("DEBUG", 
-                                        f"配置 {config_display} 价格获取成功（耗时{elapsed_time:.1f}秒）: {price_text}，将在所有通知中复用", 
-                                        "monitor")
-                                else:
-                                    self.add_log("WARNING", 
-                                        f"配置 {config_display} 价格获取失败（耗时{elapsed_time:.1f}秒），通知中不包含价格信息", 
-                                        "monitor")
-                            except Exception as e:
-                                # ✅ 统一错误处理：记录详细异常信息
-                                self.add_log("WARNING", f"价格获取过程异常: {str(e)}", "monitor")
-                                self.add_log("DEBUG", f"价格获取异常详情: {traceback.format_exc()}", "monitor")
-                    
-                    # 按change_type分组发送通知（汇总同一配置的所有有货机房）
-                    available_notifications = [n for n in notifications_to_send if n["change_type"] == "available"]
-                    unavailable_notifications = [n for n in notifications_to_send if n["change_type"] == "unavailable"]
-                    price_check_failed_notifications = [n for n in notifications_to_send if n["change_type"] == "price_check_failed"]
-                    
-                    # 过滤出需要下单的通知：只有从无货变有货或首次检查有货的情况才下单
-                    # ✅ 关键：排除价格校验失败的情况，只对价格校验通过的情况下单
-                    # 持续有货的情况不重复下单
-                    order_notifications = [
-                        n for n in available_notifications 
-                        if n.get("old_status") in [None, "unavailable"]  # 首次检查有货 或 从无货变有货
-                        and not n.get("price_check_failed", False)  # 排除价格校验失败的情况
-                    ]
-                    
-                    # 在发送有货通知之前，优先尝试下单（仅当订阅开启 autoOrder）
-                    # 只对从无货变有货的情况下单，持续有货不重复下单
-                    if order_notifications and subscription.get("autoOrder"):
+                        pending_configs.append({
+                            "config_info": config_info,
+                            "notifications": notifications_to_send,
+                            "price_dc": first_available_dc
+                        })
+            
+            # ✅ 批量价格获取：本轮所有配置的价格查询一次性提交到线程池并发执行
+            # （此前每个配置串行等待最多30秒，N个新上架配置最坏需要N×30秒）
+            price_futures = {}
+            for idx, pending in enumerate(pending_configs):
+                if pending["price_dc"]:
+                    price_futures[idx] = self._price_pool.submit(
+                        self._get_price_info, plan_code, pending["price_dc"], pending["config_info"]
+                    )
+            
+            elapsed_time = 0.0
+            if price_futures:
+                start_time = time.time()
+                concurrent.futures.wait(price_futures.values(), timeout=30.0)  # 最多等待30秒
+                elapsed_time = time.time() - start_time
+            
+            # 逐配置发送通知（复用已获取的价格）
+            for idx, pending in enumerate(pending_configs):
+                config_display = pending["config_info"]["display"]
+                price_text = None
+                future = price_futures.get(idx)
+                if future is not None:
+                    if future.done():
                         try:
-                            import requests
-                            from api_key_config import API_SECRET_KEY
-                            quantity = subscription.get("quantity", 1)  # 获取下单数量，默认为1
-                            
-                            # 计算总订单数：配置数量（1个配置）× 数据中心数量 × 数量
-                            total_orders = len(order_notifications) * quantity
-                            self.add_log("INFO", f"[monitor->order] 开始批量下单: {plan_code}, 配置数=1, 数据中心数={len(order_notifications)}, 数量={quantity}, 总订单数={total_orders}", "monitor")
-                            self.add_log("INFO", f"[monitor->order] 下单条件：仅对从无货变有货的情况下单（过滤掉持续有货的情况）", "monitor")
-                            
-                            success_count = 0
-                            fail_count = 0
-                            
-                            for notif in order_notifications:
-                                dc_to_order = notif["dc"]
-                                # 使用配置级 options（若存在），否则留空让后端自动匹配
-                                order_options = (config_info.get("options") if config_info else []) or []
-                                
-                                # 为每个数据中心创建 quantity 个订单
-                                for i in range(quantity):
-                                    payload = {
-                                        "planCode": plan_code,
-                                        "datacenter": dc_to_order,
-                                        "options": order_options,
-                                        "fromMonitor": True,  # 标记来自监控，绕过2分钟限制
-                                        "skipDuplicateCheck": True  # 跳过重复检查，允许批量下单
-                                    }
-                                    headers = {"X-API-Key": API_SECRET_KEY}
-                                    api_url = "http://127.0.0.1:19998/api/config-sniper/quick-order"
-                                    
-                                    order_num = i + 1
-                                    self.add_log("INFO", f"[monitor->order] 尝试快速下单 ({order_num}/{quantity}): {plan_code}@{dc_to_order}, options={order_options}", "monitor")
-                                    try:
-                                        resp = requests.post(api_url, json=payload, headers=headers, timeout=30)
-                                        if resp.status_code == 200:
-                                            success_count += 1
-                                            self.add_log("INFO", f"[monitor->order] 快速下单成功 ({order_num}/{quantity}): {plan_code}@{dc_to_order}", "monitor")
-                                        else:
-                                            fail_count += 1
-                                            self.add_log("WARNING", f"[monitor->order] 快速下单失败 ({order_num}/{quantity}, {resp.status_code}): {resp.text}", "monitor")
-                                    except requests.exceptions.RequestException as e:
-                                        fail_count += 1
-                                        self.add_log("WARNING", f"[monitor->order] 快速下单请求异常 ({order_num}/{quantity}): {str(e)}", "monitor")
-                            
-                            self.add_log("INFO", f"[monitor->order] 批量下单完成: 成功={success_count}, 失败={fail_count}, 总计={total_orders}", "monitor")
+                            price_text = future.result()
                         except Exception as e:
                             # ✅ 统一错误处理：记录详细异常信息
-                            self.add_log("WARNING", f"[monitor->order] 下单前置流程异常: {str(e)}", "monitor")
-                            self.add_log("DEBUG", f"[monitor->order] 下单异常详情: {traceback.format_exc()}", "monitor")
-                    
-                    # 发送有货通知（汇总所有有货的机房到一个通知，带按钮）
-                    if available_notifications:
-                        config_desc = f" [{config_info['display']}]" if config_info else ""
-                        self.add_log("INFO", f"准备发送汇总提醒: {plan_code}{config_desc} - {len(available_notifications)}个机房有货", "monitor")
-                        server_name = subscription.get("serverName")
-                        
-                        # 创建包含价格的配置信息副本
-                        config_info_with_price = config_info.copy() if config_info else None
-                        if config_info_with_price:
-                            config_info_with_price["cached_price"] = price_text  # 传递查询到的价格
-                        
-                        # 汇总所有有货的机房数据（包含补货历时时间）
-                        available_dcs = []
-                        for n in available_notifications:
-                            dc_info = {"dc": n["dc"], "status": n["status"]}
-                            if "duration_text" in n:
-                                dc_info["duration_text"] = n["duration_text"]
-                            available_dcs.append(dc_info)
-                        self.send_availability_alert_grouped(
-                            plan_code, available_dcs, config_info_with_price, server_name
-                        )
-                        
-                        # 添加到历史记录
-                        if "history" not in subscription:
-                            subscription["history"] = []
-                        
-                        for notif in available_notifications:
-                            history_entry = {
-                                "timestamp": self._now_beijing().isoformat(),
-                                "datacenter": notif["dc"],
-                                "status": notif["status"],
-                                "changeType": notif["change_type"],
-                                "oldStatus": notif["old_status"]
-                            }
-                            
-                            if config_info:
-                                history_entry["config"] = config_info
-                            
-                            subscription["history"].append(history_entry)
-                    
-                    # 发送价格校验失败通知（可用性有货但价格校验失败，触发通知但不自动下单）
-                    for notif in price_check_failed_notifications:
-                        config_desc = f" [{config_info['display']}]" if config_info else ""
-                        self.add_log("INFO", f"准备发送价格校验失败提醒: {plan_code}@{notif['dc']}{config_desc} - 可用性有货但价格校验失败", "monitor")
-                        server_name = subscription.get("serverName")
-                        
-                        # 尝试获取价格信息（即使价格校验失败，也可能有价格数据）
-                        price_text_failed = None
-                        try:
-                            price_text_failed = self._get_price_info(plan_code, notif["dc"], config_info)
-                        except Exception as e:
-                            self.add_log("DEBUG", f"价格校验失败通知中尝试获取价格信息失败: {str(e)}", "monitor")
-                        
-                        # 创建包含价格信息的配置信息副本
-                        config_info_with_price_failed = config_info.copy() if config_info else None
-                        if config_info_with_price_failed and price_text_failed:
-                            config_info_with_price_failed["cached_price"] = price_text_failed
-                            config_info_with_price_failed["price_check_error"] = notif.get("price_check_error")
-                        
-                        # 发送特殊通知，说明可用性有货但价格校验失败
-                        self.send_availability_alert(
-                            plan_code, 
-                            notif["dc"], 
-                            "unavailable",  # 状态标记为无货（因为实际不可下单）
-                            "price_check_failed",  # 特殊类型：价格校验失败
-                            config_info_with_price_failed if config_info_with_price_failed else config_info, 
-                            server_name,
-                            duration_text=None,
-                            price_check_error=notif.get("price_check_error")
-                        )
-                        
-                        # 添加到历史记录
-                        if "history" not in subscription:
-                            subscription["history"] = []
-                        
-                        history_entry = {
-                            "timestamp": self._now_beijing().isoformat(),
-                            "datacenter": notif["dc"],
-                            "status": "price_check_failed",  # 使用特殊状态值
-                            "changeType": "price_check_failed",
-                            "oldStatus": notif["old_status"]
-                        }
-                        
-                        if config_info:
-                            history_entry["config"] = config_info
-                        
-                        subscription["history"].append(history_entry)
-                    
-                    # 发送无货通知（每个机房单独发送）
-                    for notif in unavailable_notifications:
-                        config_desc = f" [{config_info['display']}]" if config_info else ""
-                        self.add_log("INFO", f"准备发送提醒: {plan_code}@{notif['dc']}{config_desc} - {notif['change_type']}", "monitor")
-                        server_name = subscription.get("serverName")
-                        
-                        # 计算从有货到无货的持续时长（仅在确实是从有货变无货时计算）
-                        duration_text = None
-                        # 只有当前状态是无货，且旧状态不是无货或None时，才是"从有货变无货"
-                        is_became_unavailable = (notif["change_type"] == "unavailable" and 
-                                                  notif.get("old_status") not in ["unavailable", None])
-                        if is_became_unavailable:
-                            try:
-                                last_available_ts = None
-                                same_config_display = config_info.get("display") if config_info else None
-                                history_list = subscription.get("history", [])
-                                self.add_log("INFO", f"[历时计算] {plan_code}@{notif['dc']} 从有货变无货，old_status={notif.get('old_status')}, 历史记录数: {len(history_list)}, 配置: {same_config_display}", "monitor")
-                                # 如果历史记录为空，尝试从同一轮检查的有货通知中获取时间戳
-                                # 注意：有货通知的历史记录已经在上面添加到 subscription["history"] 中
-                                # 从后向前查找最近一次相同机房（且相同配置显示文本时更精确）的 available 记录
-                                for entry in reversed(history_list):
-                                    if entry.get("datacenter") != notif["dc"]:
-                                        continue
-                                    if entry.get("changeType") != "available":
-                                        continue
-                                    if same_config_display:
-                                        cfg = entry.get("config", {})
-                                        if cfg and cfg.get("display") != same_config_display:
-                                            continue
-                                    last_available_ts = entry.get("timestamp")
-                                    if last_available_ts:
-                                        self.add_log("INFO", f"[历时计算] 找到有货记录: {plan_code}@{notif['dc']}, 时间: {last_available_ts}", "monitor")
-                                        break
-                                if last_available_ts:
-                                    try:
-                                        # 解析ISO时间，按北京时间计算时长（兼容无时区与带时区）
-                                        from datetime import datetime as _dt
-                                        try:
-                                            # 优先解析为带时区
-                                            start_dt = _dt.fromisoformat(last_available_ts.replace("Z", "+00:00"))
-                                        except Exception:
-                                            start_dt = _dt.fromisoformat(last_available_ts)
-                                        # 若解析为naive时间，视为北京时间
-                                        if start_dt.tzinfo is None:
-                                            try:
-                                                from zoneinfo import ZoneInfo
-                                                start_dt = start_dt.replace(tzinfo=ZoneInfo("Asia/Shanghai"))
-                                            except Exception:
-                                                # 退化：将其视为UTC+8
-                                                start_dt = start_dt
-                                        delta = self._now_beijing() - start_dt
-                                        total_sec = int(delta.total_seconds())
-                                        if total_sec < 0:
-                                            total_sec = 0
-                                        days = total_sec // 86400
-                                        rem = total_sec % 86400
-                                        hours = rem // 3600
-                                        minutes = (rem % 3600) // 60
-                                        seconds = rem % 60
-                                        if days > 0:
-                                            duration_text = f"历时 {days}天{hours}小时{minutes}分{seconds}秒"
-                                        elif hours > 0:
-                                            duration_text = f"历时 {hours}小时{minutes}分{seconds}秒"
-                                        elif minutes > 0:
-                                            duration_text = f"历时 {minutes}分{seconds}秒"
-                                        else:
-                                            duration_text = f"历时 {seconds}秒"
-                                        self.add_log("INFO", f"[历时计算] 计算成功: {plan_code}@{notif['dc']}, {duration_text}", "monitor")
-                                    except Exception as e:
-                                        self.add_log("WARNING", f"[历时计算] 计算异常: {plan_code}@{notif['dc']}, 错误: {str(e)}", "monitor")
-                                        duration_text = None
-                                else:
-                                    self.add_log("INFO", f"[历时计算] 未找到有货记录: {plan_code}@{notif['dc']}, 无法计算历时", "monitor")
-                            except Exception as e:
-                                self.add_log("WARNING", f"[历时计算] 查找异常: {plan_code}@{notif['dc']}, 错误: {str(e)}", "monitor")
-                                duration_text = None
-                        else:
-                            # 首次检查或无货通知，不计算历时
-                            pass
-                        
-                        self.send_availability_alert(plan_code, notif["dc"], notif["status"], notif["change_type"], 
-                                                    config_info, server_name, duration_text=duration_text)
-                        
-                        # 添加到历史记录
-                        if "history" not in subscription:
-                            subscription["history"] = []
-                        
-                        history_entry = {
-                            "timestamp": self._now_beijing().isoformat(),
-                            "datacenter": notif["dc"],
-                            "status": notif["status"],
-                            "changeType": notif["change_type"],
-                            "oldStatus": notif["old_status"]
-                        }
-                        
-                        if config_info:
-                            history_entry["config"] = config_info
-                        
-                        subscription["history"].append(history_entry)
+                            self.add_log("WARNING", f"价格获取过程异常: {str(e)}", "monitor")
+                    else:
+                        # ✅ 超时，记录详细信息（任务会在线程池中继续完成）
+                        self.add_log("WARNING",
+                            f"配置 {config_display} 价格获取超时（已等待{elapsed_time:.1f}秒），"
+                            f"发送不带价格的通知。价格任务将在线程池中继续运行直到完成。",
+                            "monitor")
                     
-                    # ✅ 使用统一方法限制历史记录数量（在循环外统一限制，避免重复检查）
-                    self._limit_history_size(subscription)
-            
-            # 更新状态（需要转换为状态字典）
-            new_last_status = {}
-            for config_key, config_data in current_availability.items():
-                if isinstance(config_data, str):
-                    # 简单的数据中心状态
-                    new_last_status[config_key] = config_data
-                elif isinstance(config_data, dict) and "datacenters" in config_data:
-                    # 配置级别的状态
-                    for dc, status in config_data["datacenters"].items():
-                        status_key = f"{dc}|{config_key}"
-                        new_last_status[status_key] = status
+                    if price_text:
+                        self.add_log("DEBUG", 
+                            f"配置 {config_display} 价格获取成功（耗时{elapsed_time:.1f}秒）: {price_text}，将在所有通知中复用", 
+                            "monitor")
+                    elif future.done():
+                        self.add_log("WARNING", 
+                            f"配置 {config_display} 价格获取失败（耗时{elapsed_time:.1f}秒），通知中不包含价格信息", 
+                            "monitor")
+                
+                self._dispatch_config_notifications(
+                    subscription, plan_code, pending["config_info"], pending["notifications"], price_text
+                )
             
+            # 更新状态（主遍历时已增量填充，无需二次遍历 current_availability）
             subscription["lastStatus"] = new_last_status
             
         except Exception as e:
             self.add_log("ERROR", f"检查 {plan_code} 可用性时出错: {str(e)}", "monitor")
             self.add_log("ERROR", f"错误详情: {traceback.format_exc()}", "monitor")
     
+    def _dispatch_config_notifications(self, subscription, plan_code, config_info, notifications_to_send, price_text):
+        """
+        针对单个配置执行自动下单、发送通知并记录历史
+
+        Args:
+            subscription: 订阅对象
+            plan_code: 服务器型号
+            config_info: 配置信息 {"memory": "xxx", "storage": "xxx", "display": "xxx", "options": [...]}
+            notifications_to_send: 本配置下需要通知的数据中心列表
+            price_text: 批量价格获取阶段查询到的价格文本（可能为None）
+        """
+        # 配置描述对整个方法不变，构建一次
+        config_desc = f" [{config_info['display']}]" if config_info else ""
+
+        # 按change_type分组发送通知（汇总同一配置的所有有货机房）
+        available_notifications = [n for n in notifications_to_send if n["change_type"] == "available"]
+        unavailable_notifications = [n for n in notifications_to_send if n["change_type"] == "unavailable"]
+        price_check_failed_notifications = [n for n in notifications_to_send if n["change_type"] == "price_check_failed"]
+        
+        # 过滤出需要下单的通知：只有从无货变有货或首次检查有货的情况才下单
+        # ✅ 关键：排除价格校验失败的情况，只对价格校验通过的情况下单
+        # 持续有货的情况不重复下单
+        order_notifications = [
+            n for n in available_notifications 
+            if n.get("old_status") in [None, "unavailable"]  # 首次检查有货 或 从无货变有货
+            and not n.get("price_check_failed", False)  # 排除价格校验失败的情况
+        ]
+        
+        # 在发送有货通知之前，优先尝试下单（仅当订阅开启 autoOrder）
+        # 只对从无货变有货的情况下单，持续有货不重复下单
+        if order_notifications and subscription.get("autoOrder"):
+            try:
+                quantity = subscription.get("quantity", 1)  # 获取下单数量，默认为1
+                # 使用配置级 options（若存在），否则留空让后端自动匹配
+                order_options = (config_info.get("options") if config_info else []) or []
+
+                # 一次请求提交本tick全部订单（每个机房 quantity 份），
+                # 替代逐单POST的串行往返（最坏 N×30秒 尾延迟）
+                batch = [
+                    {"planCode": plan_code, "datacenter": notif["dc"], "options": order_options}
+                    for notif in order_notifications
+                    for _ in range(quantity)
+                ]
+                total_orders = len(batch)
+                self.add_log("INFO", f"[monitor->order] 开始批量下单: {plan_code}, 配置数=1, 数据中心数={len(order_notifications)}, 数量={quantity}, 总订单数={total_orders}", "monitor")
+                self.add_log("INFO", f"[monitor->order] 下单条件：仅对从无货变有货的情况下单（过滤掉持续有货的情况）", "monitor")
+
+                headers = {"X-API-Key": API_SECRET_KEY}
+                api_url = "http://127.0.0.1:19998/api/config-sniper/quick-order-batch"
+
+                success_count = 0
+                fail_count = 0
+                try:
+                    resp = self._http_session.post(api_url, json={"orders": batch}, headers=headers, timeout=30)
+                    if resp.status_code == 200:
+                        for item in resp.json().get("results", []):
+                            if item.get("success"):
+                                success_count += 1
+                                self.add_log("INFO", f"[monitor->order] 快速下单成功: {plan_code}@{item.get('datacenter')}", "monitor")
+                            else:
+                                fail_count += 1
+                                self.add_log("WARNING", f"[monitor->order] 快速下单失败: {plan_code}@{item.get('datacenter')} - {item.get('error')}", "monitor")
+                    else:
+                        fail_count = total_orders
+                        self.add_log("WARNING", f"[monitor->order] 批量下单请求失败 ({resp.status_code}): {resp.text}", "monitor")
+                except requests.exceptions.RequestException as e:
+                    fail_count = total_orders
+                    self.add_log("WARNING", f"[monitor->order] 批量下单请求异常: {str(e)}", "monitor")
+
+                self.add_log("INFO", f"[monitor->order] 批量下单完成: 成功={success_count}, 失败={fail_count}, 总计={total_orders}", "monitor")
+            except Exception as e:
+                # ✅ 统一错误处理：记录详细异常信息
+                self.add_log("WARNING", f"[monitor->order] 下单前置流程异常: {str(e)}", "monitor")
+                self.add_log("DEBUG", f"[monitor->order] 下单异常详情: {traceback.format_exc()}", "monitor")
+        
+        # 发送有货通知（汇总所有有货的机房到一个通知，带按钮）
+        if available_notifications:
+            self.add_log("INFO", f"准备发送汇总提醒: {plan_code}{config_desc} - {len(available_notifications)}个机房有货", "monitor")
+            server_name = subscription.get("serverName")
+            
+            # 创建包含价格的配置信息副本
+            config_info_with_price = config_info.copy() if config_info else None
+            if config_info_with_price:
+                config_info_with_price["cached_price"] = price_text  # 传递查询到的价格
+            
+            # 汇总所有有货的机房数据（包含补货历时时间）
+            available_dcs = []
+            for n in available_notifications:
+                dc_info = {"dc": n["dc"], "status": n["status"]}
+                if "duration_text" in n:
+                    dc_info["duration_text"] = n["duration_text"]
+                available_dcs.append(dc_info)
+            self.send_availability_alert_grouped(
+                plan_code, available_dcs, config_info_with_price, server_name
+            )
+            
+            # 添加到历史记录
+            for notif in available_notifications:
+                self._append_history(subscription, notif["dc"], notif["status"],
+                                     notif["change_type"], notif["old_status"], config_info)
+        
+        # 发送价格校验失败通知（可用性有货但价格校验失败，触发通知但不自动下单）
+        for notif in price_check_failed_notifications:
+            self.add_log("INFO", f"准备发送价格校验失败提醒: {plan_code}@{notif['dc']}{config_desc} - 可用性有货但价格校验失败", "monitor")
+            server_name = subscription.get("serverName")
+            
+            # 尝试获取价格信息（即使价格校验失败，也可能有价格数据）
+            price_text_failed = None
+            try:
+                price_text_failed = self._get_price_info(plan_code, notif["dc"], config_info)
+            except Exception as e:
+                self.add_log("DEBUG", f"价格校验失败通知中尝试获取价格信息失败: {str(e)}", "monitor")
+            
+            # 创建包含价格信息的配置信息副本
+            config_info_with_price_failed = config_info.copy() if config_info else None
+            if config_info_with_price_failed and price_text_failed:
+                config_info_with_price_failed["cached_price"] = price_text_failed
+                config_info_with_price_failed["price_check_error"] = notif.get("price_check_error")
+            
+            # 发送特殊通知，说明可用性有货但价格校验失败
+            self.send_availability_alert(
+                plan_code, 
+                notif["dc"], 
+                "unavailable",  # 状态标记为无货（因为实际不可下单）
+                "price_check_failed",  # 特殊类型：价格校验失败
+                config_info_with_price_failed if config_info_with_price_failed else config_info, 
+                server_name,
+                duration_text=None,
+                price_check_error=notif.get("price_check_error")
+            )
+            
+            # 添加到历史记录（使用特殊状态值）
+            self._append_history(subscription, notif["dc"], "price_check_failed",
+                                 "price_check_failed", notif["old_status"], config_info)
+        
+        # 发送无货通知（每个机房单独发送）
+        for notif in unavailable_notifications:
+            self.add_log("INFO", f"准备发送提醒: {plan_code}@{notif['dc']}{config_desc} - {notif['change_type']}", "monitor")
+            server_name = subscription.get("serverName")
+            
+            # 计算从有货到无货的持续时长（仅在确实是从有货变无货时计算）
+            # 无货通知本身已在收集阶段被 notifyUnavailable 开关过滤，
+            # 能走到这里必然会发通知，无需再判开关；索引无记录时直接跳过全部历时工作
+            duration_text = None
+            # 只有当前状态是无货，且旧状态不是无货或None时，才是"从有货变无货"
+            is_became_unavailable = (notif["change_type"] == "unavailable" and
+                                      notif.get("old_status") not in ["unavailable", None])
+            if is_became_unavailable:
+                try:
+                    same_config_display = config_info.get("display") if config_info else None
+                    # 最近一次相同机房+配置的 available 时间：索引O(1)查询，替代历史记录反向扫描
+                    # （索引在每次追加历史记录时同步维护，见 _update_history_index）
+                    last_available_ts = subscription.get("_last_available", {}).get(
+                        (notif["dc"], same_config_display)
+                    )
+                    if last_available_ts:
+                        self.add_log("INFO", f"[历时计算] 找到有货记录: {plan_code}@{notif['dc']}, 时间: {last_available_ts}", "monitor")
+                        try:
+                            # 索引存unix时间戳，历时计算只需一次浮点减法（无ISO解析/时区处理）
+                            total_sec = int(time.time() - last_available_ts)
+                            if total_sec < 0:
+                                total_sec = 0
+                            duration_text = self._format_duration(total_sec)
+                            self.add_log("INFO", f"[历时计算] 计算成功: {plan_code}@{notif['dc']}, {duration_text}", "monitor")
+                        except Exception as e:
+                            self.add_log("WARNING", f"[历时计算] 计算异常: {plan_code}@{notif['dc']}, 错误: {str(e)}", "monitor")
+                            duration_text = None
+                    else:
+                        self.add_log("INFO", f"[历时计算] 未找到有货记录: {plan_code}@{notif['dc']}, 无法计算历时", "monitor")
+                except Exception as e:
+                    self.add_log("WARNING", f"[历时计算] 查找异常: {plan_code}@{notif['dc']}, 错误: {str(e)}", "monitor")
+                    duration_text = None
+
+            self.send_availability_alert(plan_code, notif["dc"], notif["status"], notif["change_type"], 
+                                        config_info, server_name, duration_text=duration_text)
+            
+            # 添加到历史记录
+            self._append_history(subscription, notif["dc"], notif["status"],
+                                 notif["change_type"], notif["old_status"], config_info)
+
     def _check_and_notify_change(self, subscription, plan_code, dc, status, old_status, config_info=None, status_key=None):
         """
         检查状态变化并发送通知
@@ -733,44 +872,24 @@ class ServerMonitor:
             config_info: 配置信息 {"memory": "xxx", "storage": "xxx", "display": "xxx"}
             status_key: 状态键（用于lastStatus）
         """
-        # 状态变化检测（包括首次检查）
+        # 配置描述构建一次，两处日志复用
+        config_desc = f" [{config_info['display']}]" if config_info else ""
+
+        # 状态变化检测（查表判定状态变迁，包括首次检查）
         status_changed = False
-        change_type = None
-        
-        # 首次检查时也发送通知（如果配置允许）
-        if old_status is None:
-            config_desc = f" [{config_info['display']}]" if config_info else ""
-            if status == "unavailable":
-                self.add_log("INFO", f"首次检查: {plan_code}@{dc}{config_desc} 无货", "monitor")
-                # 首次检查无货时不通知（除非用户明确要求）
-                if subscription.get("notifyUnavailable", False):
-                    status_changed = True
-                    change_type = "unavailable"
+        change_type = self._classify_change(old_status, status)
+        if change_type is not None:
+            # unavailable通知默认关闭，available通知默认开启
+            if change_type == "unavailable":
+                notify_enabled = subscription.get("notifyUnavailable", False)
             else:
-                # 首次检查有货时发送通知
-                self.add_log("INFO", f"首次检查: {plan_code}@{dc}{config_desc} 有货（状态: {status}），发送通知", "monitor")
-                if subscription.get("notifyAvailable", True):
-                    status_changed = True
-                    change_type = "available"
-        # 从无货变有货
-        elif old_status == "unavailable" and status != "unavailable":
-            if subscription.get("notifyAvailable", True):
-                status_changed = True
-                change_type = "available"
-                config_desc = f" [{config_info['display']}]" if config_info else ""
-                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从无货变有货", "monitor")
-        
-        # 从有货变无货
-        elif old_status not in ["unavailable", None] and status == "unavailable":
-            if subscription.get("notifyUnavailable", False):
+                notify_enabled = subscription.get("notifyAvailable", True)
+            if notify_enabled:
                 status_changed = True
-                change_type = "unavailable"
-                config_desc = f" [{config_info['display']}]" if config_info else ""
-                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 从有货变无货", "monitor")
-        
+                self.add_log("INFO", f"{plan_code}@{dc}{config_desc} 状态变化: {old_status if old_status is not None else '首次检查'} -> {status}，触发{change_type}通知", "monitor")
+
         # 发送通知并记录历史
         if status_changed:
-            config_desc = f" [{config_info['display']}]" if config_info else ""
             self.add_log("INFO", f"准备发送提醒: {plan_code}@{dc}{config_desc} - {change_type}", "monitor")
             # 获取服务器名称
             server_name = subscription.get("serverName")
@@ -779,59 +898,17 @@ class ServerMonitor:
             duration_text = None
             if change_type == "unavailable":
                 try:
-                    last_available_ts = None
                     same_config_display = config_info.get("display") if config_info else None
-                    # 从后向前查找最近一次相同机房（且相同配置显示文本时更精确）的 available 记录
-                    for entry in reversed(subscription.get("history", [])):
-                        if entry.get("datacenter") != dc:
-                            continue
-                        if entry.get("changeType") != "available":
-                            continue
-                        if same_config_display:
-                            cfg = entry.get("config", {})
-                            if cfg.get("display") != same_config_display:
-                                continue
-                        last_available_ts = entry.get("timestamp")
-                        if last_available_ts:
-                            break
+                    # 最近一次相同机房+配置的 available 时间：索引O(1)查询，
+                    # 替代历史记录反向扫描+ISO解析（索引随历史记录追加同步维护）
+                    last_available_ts = subscription.get("_last_available", {}).get(
+                        (dc, same_config_display)
+                    )
                     if last_available_ts:
-                        try:
-                            # 解析ISO时间，按北京时间计算时长（兼容无时区与带时区）
-                            from datetime import datetime as _dt
-                            try:
-                                # 优先解析为带时区
-                                start_dt = _dt.fromisoformat(last_available_ts.replace("Z", "+00:00"))
-                            except Exception:
-                                start_dt = _dt.fromisoformat(last_available_ts)
-                            # 若解析为naive时间，视为北京时间
-                            if start_dt.tzinfo is None:
-                                try:
-                                    from zoneinfo import ZoneInfo
-                                    start_dt = start_dt.replace(tzinfo=ZoneInfo("Asia/Shanghai"))
-                                except Exception:
-                                    # 退化：将其视为UTC+8
-                                    start_dt = start_dt
-                            delta = self._now_beijing() - start_dt
-                            total_sec = int(delta.total_seconds())
-                            if total_sec < 0:
-                                total_sec = 0
-                            days = total_sec // 86400
-                            rem = total_sec % 86400
-                            hours = rem // 3600
-                            minutes = (rem % 3600) // 60
-                            seconds = rem % 60
-                            if days > 0:
-                                duration_text = f"历时 {days}天{hours}小时{minutes}分{seconds}秒"
-                            elif hours > 0:
-                                duration_text = f"历时 {hours}小时{minutes}分{seconds}秒"
-                            elif minutes > 0:
-                                duration_text = f"历时 {minutes}分{seconds}秒"
-                            else:
-                                duration_text = f"历时 {seconds}秒"
-                        except Exception as e:
-                            # ✅ 统一错误处理：记录异常但不中断流程
-                            self.add_log("DEBUG", f"计算历时异常: {str(e)}", "monitor")
-                            duration_text = None
+                        total_sec = int(time.time() - last_available_ts)
+                        if total_sec < 0:
+                            total_sec = 0
+                        duration_text = self._format_duration(total_sec)
                 except Exception as e:
                     # ✅ 统一错误处理：记录异常但不中断流程
                     self.add_log("DEBUG", f"查找有货记录异常: {str(e)}", "monitor")
@@ -840,25 +917,7 @@ class ServerMonitor:
             self.send_availability_alert(plan_code, dc, status, change_type, config_info, server_name, duration_text=duration_text)
             
             # 添加到历史记录
-            if "history" not in subscription:
-                subscription["history"] = []
-            
-            history_entry = {
-                "timestamp": self._now_beijing().isoformat(),
-                "datacenter": dc,
-                "status": status,
-                "changeType": change_type,
-                "oldStatus": old_status
-            }
-            
-            # 添加配置信息到历史记录
-            if config_info:
-                history_entry["config"] = config_info
-            
-            subscription["history"].append(history_entry)
-            
-            # ✅ 使用统一方法限制历史记录数量，保留最近100条
-            self._limit_history_size(subscription)
+            self._append_history(subscription, dc, status, change_type, old_status, config_info)
     
     def send_availability_alert_grouped(self, plan_code, available_dcs, config_info=None, server_name=None):
         """
@@ -871,149 +930,99 @@ class ServerMonitor:
             server_name: 服务器友好名称
         """
         try:
-            import json
-            import base64
-            
-            message = f"🎉 服务器上架通知！\n\n"
-            
+            # 消息用列表收集、最后join，避免反复 str += 产生的中间字符串
+            parts = ["🎉 服务器上架通知！\n\n"]
+
             if server_name:
-                message += f"服务器: {server_name}\n"
-            
-            message += f"型号: {plan_code}\n"
-            
+                parts.append(f"服务器: {server_name}\n")
+
+            parts.append(f"型号: {plan_code}\n")
+
             if config_info:
-                message += (
+                parts.append(
                     f"配置: {config_info['display']}\n"
                     f"├─ 内存: {config_info['memory']}\n"
                     f"└─ 存储: {config_info['storage']}\n"
                 )
-            
+
             # 添加价格信息
             price_text = None
             if config_info and "cached_price" in config_info:
                 price_text = config_info.get("cached_price")
-            
+
             if price_text:
-                message += f"\n💰 价格: {price_text}\n"
-            
-            message += f"\n✅ 有货的机房 ({len(available_dcs)}个):\n"
+                parts.append(f"\n💰 价格: {price_text}\n")
+
+            parts.append(f"\n✅ 有货的机房 ({len(available_dcs)}个):\n")
             for dc_info in available_dcs:
                 dc = dc_info.get("dc", "")
                 status = dc_info.get("status", "")
-                # 数据中心名称映射
-                dc_display_map = {
-                    "gra": "🇫🇷 法国·格拉沃利讷",
-                    "rbx": "🇫🇷 法国·鲁贝",
-                    "sbg": "🇫🇷 法国·斯特拉斯堡",
-                    "bhs": "🇨🇦 加拿大·博舍维尔",
-                    "syd": "🇦🇺 澳大利亚·悉尼",
-                    "sgp": "🇸🇬 新加坡",
-                    "ynm": "🇮🇳 印度·孟买",
-                    "waw": "🇵🇱 波兰·华沙",
-                    "fra": "🇩🇪 德国·法兰克福",
-                    "lon": "🇬🇧 英国·伦敦",
-                    "par": "🇫🇷 法国·巴黎",
-                    "eri": "🇮🇹 意大利·埃里切",
-                    "lim": "🇵🇱 波兰·利马诺瓦",
-                    "vin": "🇺🇸 美国·弗吉尼亚",
-                    "hil": "🇺🇸 美国·俄勒冈"
-                }
-                dc_display = dc_display_map.get(dc.lower(), dc.upper())
-                message += f"  • {dc_display} ({dc.upper()})"
+                # 数据中心名称映射（模块级常量，dc只小写/大写各转一次）
+                dc_upper = dc.upper()
+                dc_display = DC_DISPLAY_MAP.get(dc.lower(), dc_upper)
+                parts.append(f"  • {dc_display} ({dc_upper})")
                 # ✅ 如果有补货历时时间，添加到机房信息中
                 if "duration_text" in dc_info and dc_info["duration_text"]:
                     duration_display = dc_info["duration_text"].replace("历时 ", "⏱️ ")
-                    message += f" - {duration_display}"
-                message += "\n"
-            
-            message += f"\n⏰ 时间: {self._now_beijing().strftime('%Y-%m-%d %H:%M:%S')}"
-            message += f"\n\n💡 点击下方按钮可直接下单对应机房！"
+                    parts.append(f" - {duration_display}")
+                parts.append("\n")
+
+            parts.append(f"\n⏰ 时间: {self._now_beijing().strftime('%Y-%m-%d %H:%M:%S')}")
+            parts.append("\n\n💡 点击下方按钮可直接下单对应机房！")
+            message = "".join(parts)
             
             # 构建内联键盘按钮（每个机房一个按钮，最多每行2个按钮）
             inline_keyboard = []
             row = []
+            # 各按钮共用的配置信息与时间戳在循环外取一次
+            options = config_info.get("options", []) if config_info else []
+            cache_ts = time.time()
+            new_entries = {}  # 本条消息所有按钮的UUID条目，循环后一次性写入缓存
             for idx, dc_info in enumerate(available_dcs):
                 dc = dc_info.get("dc", "")
-                dc_display_map = {
-                    "gra": "🇫🇷 Gra",
-                    "rbx": "🇫🇷 Rbx",
-                    "sbg": "🇫🇷 Sbg",
-                    "bhs": "🇨🇦 Bhs",
-                    "syd": "🇦🇺 Syd",
-                    "sgp": "🇸🇬 Sgp",
-                    "ynm": "🇮🇳 Mum",
-                    "waw": "🇵🇱 Waw",
-                    "fra": "🇩🇪 Fra",
-                    "lon": "🇬🇧 Lon",
-                    "par": "🇫🇷 Par",
-                    "eri": "🇮🇹 Eri",
-                    "lim": "🇵🇱 Lim",
-                    "vin": "🇺🇸 Vin",
-                    "hil": "🇺🇸 Hil"
-                }
                 # 生成按钮文本，包含机房信息和"一键下单"提示
-                dc_display_short = dc_display_map.get(dc.lower(), dc.upper())
+                dc_display_short = DC_SHORT_MAP.get(dc.lower(), dc.upper())
                 button_text = f"{dc_display_short} 一键下单"
-                
-                # 提取配置信息
-                options = config_info.get("options", []) if config_info else []
-                
-                # 为每个按钮生成UUID并存储完整配置信息（UUID机制）
-                message_uuid = str(uuid.uuid4())
-                # ✅ 使用锁保护缓存写入操作
-                with self._cache_lock:
-                    self.message_uuid_cache[message_uuid] = {
-                        "planCode": plan_code,
-                        "datacenter": dc,
-                        "options": options,
-                        "configInfo": config_info,  # 保存完整的config_info以便将来扩展
-                        "timestamp": time.time()
-                    }
-                self.add_log("DEBUG", f"生成消息UUID: {message_uuid}, 配置: {plan_code}@{dc}, options={options}", "monitor")
-                
-                # callback_data 只包含UUID（使用短格式：u=uuid）
-                # 格式：{"a":"add_to_queue","u":"uuid"}，JSON后约45-50字节，远小于64字节限制
-                callback_data = {
-                    "a": "add_to_queue",
-                    "u": message_uuid  # u = uuid
+
+                # 为每个按钮生成短ID并存储完整配置信息
+                # token_urlsafe(9) 生成12个base64url字符，碰撞概率可忽略且比uuid4短/快
+                message_uuid = secrets.token_urlsafe(9)
+                new_entries[message_uuid] = {
+                    "planCode": plan_code,
+                    "datacenter": dc,
+                    "options": options,
+                    "configInfo": config_info,  # 保存完整的config_info以便将来扩展
+                    "timestamp": cache_ts
                 }
-                callback_data_str = json.dumps(callback_data, ensure_ascii=False, separators=(',', ':'))
-                
-                # UUID机制下，callback_data通常只有40-50字节，远小于64字节限制
-                if len(callback_data_str) > 64:
-                    self.add_log("WARNING", f"UUID callback_data异常长: {len(callback_data_str)}字节, UUID={message_uuid}", "monitor")
-                
-                callback_data_final = callback_data_str[:64]  # 安全限制，但通常不会截断
-                
+
+                # callback_data 只包含短ID（使用短格式：u=id）
+                # 短ID为base64url字符集，无需JSON转义，直接套模板（省去每按钮一次dumps）
+                # 模板+12字符短ID为定长39字节，必然低于Telegram的64字节上限，无需再检查/截断
+                callback_data_str = _CB_DATA_TMPL.format(message_uuid)
+
                 row.append({
                     "text": button_text,
-                    "callback_data": callback_data_final
+                    "callback_data": callback_data_str
                 })
-                
+
                 # 每行最多2个按钮
                 if len(row) >= 2 or idx == len(available_dcs) - 1:
                     inline_keyboard.append(row)
                     row = []
-            
+
+            # 批量写入UUID缓存：dict.update在GIL下整体执行，之后统一做一次容量淘汰
+            self.message_uuid_cache.update(new_entries)
+            while len(self.message_uuid_cache) > CACHE_MAX_ENTRIES:
+                self.message_uuid_cache.pop(next(iter(self.message_uuid_cache)), None)
+            self._log("DEBUG", "生成消息UUID: %s, 配置: %s, options=%s", list(new_entries), plan_code, options)
+
             reply_markup = {"inline_keyboard": inline_keyboard}
             
             config_desc = f" [{config_info['display']}]" if config_info else ""
             self.add_log("INFO", f"正在发送汇总Telegram通知: {plan_code}{config_desc} - {len(available_dcs)}个机房", "monitor")
             
-            # 调用发送函数，传入reply_markup
-            # 检查send_notification是否支持reply_markup参数
-            import inspect
-            sig = inspect.signature(self.send_notification)
-            if 'reply_markup' in sig.parameters:
-                result = self.send_notification(message, reply_markup=reply_markup)
-            else:
-                # 如果不支持，先尝试用**kwargs方式调用
-                try:
-                    result = self.send_notification(message, **{"reply_markup": reply_markup})
-                except:
-                    # 如果还是不支持，先记录警告然后只发送消息
-                    self.add_log("WARNING", "send_notification函数不支持reply_markup参数，仅发送文字消息", "monitor")
-                    result = self.send_notification(message)
+            # 调用发送函数，传入reply_markup（入口在__init__一次性解析）
+            result = self._send_alert(message, reply_markup)
             
             if result:
                 self.add_log("INFO", f"✅ Telegram汇总通知发送成功: {plan_code}{config_desc}", "monitor")
@@ -1022,7 +1031,6 @@ class ServerMonitor:
                 
         except Exception as e:
             self.add_log("ERROR", f"发送汇总提醒时发生异常: {str(e)}", "monitor")
-            import traceback
             self.add_log("ERROR", f"错误详情: {traceback.format_exc()}", "monitor")
     
     def send_availability_alert(self, plan_code, datacenter, status, change_type, config_info=None, server_name=None, duration_text=None, price_check_error=None):
@@ -1038,20 +1046,23 @@ class ServerMonitor:
             server_name: 服务器友好名称（如"KS-2 | Intel Xeon-D 1540"）
         """
         try:
+            # 当前时间取一次、格式化一次，三个分支复用（strftime开销不小）
+            now_str = self._now_beijing().strftime('%Y-%m-%d %H:%M:%S')
+
             if change_type == "available":
-                # 基础消息
-                message = f"🎉 服务器上架通知！\n\n"
+                # 基础消息（列表收集、最后join，避免反复 str += 产生中间字符串）
+                parts = ["🎉 服务器上架通知！\n\n"]
                 
                 # 添加服务器名称（如果有）
                 if server_name:
-                    message += f"服务器: {server_name}\n"
+                    parts.append(f"服务器: {server_name}\n")
                 
-                message += f"型号: {plan_code}\n"
-                message += f"数据中心: {datacenter}\n"
+                parts.append(f"型号: {plan_code}\n")
+                parts.append(f"数据中心: {datacenter}\n")
                 
                 # 添加配置信息（如果有）
                 if config_info:
-                    message += (
+                    parts.append(
                         f"配置: {config_info['display']}\n"
                         f"├─ 内存: {config_info['memory']}\n"
                         f"└─ 存储: {config_info['storage']}\n"
@@ -1059,93 +1070,67 @@ class ServerMonitor:
                 
                 # 获取价格信息（优先使用缓存的价格）
                 price_text = None
-                
+
                 # 如果config_info中包含已查询的价格，直接使用
+                # cached_price 键存在即表示上游已经查过一次（值可能为None即查询失败），
+                # 此时不再重复查询，避免通知路径白白阻塞最多30秒
                 if config_info and "cached_price" in config_info:
                     price_text = config_info.get("cached_price")
                     if price_text:
-                        self.add_log("DEBUG", f"使用已查询的价格: {price_text}", "monitor")
-                
-                # 如果没有缓存的价格，才去查询
-                if not price_text:
+                        self._log("DEBUG", "使用已查询的价格: %s", price_text)
+                else:
+                    # 上游未查询过价格，才提交到价格线程池（复用线程并应用30秒超时）
                     try:
-                        import threading
-                        import queue
-                        price_queue = queue.Queue()
-                        
-                        def fetch_price():
-                            try:
-                                price_result = self._get_price_info(plan_code, datacenter, config_info)
-                                price_queue.put(price_result)
-                            except Exception as e:
-                                self.add_log("WARNING", f"价格获取线程异常: {str(e)}", "monitor")
-                                price_queue.put(None)
-                        
-                        # 启动价格获取线程
-                        price_thread = threading.Thread(
-                            target=fetch_price, 
-                            daemon=True,
-                            name=f"PriceFetch-{plan_code}-{datacenter}"
-                        )
-                        price_thread.start()
+                        future = self._price_pool.submit(self._get_price_info, plan_code, datacenter, config_info)
                         start_time = time.time()
-                        price_thread.join(timeout=30.0)  # 最多等待30秒
-                        elapsed_time = time.time() - start_time
-                        
-                        if price_thread.is_alive():
-                            # ✅ 线程超时，记录详细信息（daemon线程会在主程序退出时自动结束）
-                            self.add_log("WARNING", 
-                                f"价格获取超时（已等待{elapsed_time:.1f}秒，线程ID: {price_thread.ident}），"
-                                f"发送不带价格的通知。daemon线程将在后台继续运行直到完成。", 
+                        try:
+                            price_text = future.result(timeout=30.0)  # 最多等待30秒
+                        except concurrent.futures.TimeoutError:
+                            # ✅ 超时，任务会在线程池中继续完成，不再泄漏一次性daemon线程
+                            elapsed_time = time.time() - start_time
+                            self.add_log("WARNING",
+                                f"价格获取超时（已等待{elapsed_time:.1f}秒），"
+                                f"发送不带价格的通知。价格任务将在线程池中继续运行直到完成。",
                                 "monitor")
                             price_text = None
-                        else:
-                            # 线程已完成，尝试获取结果
-                            try:
-                                price_text = price_queue.get_nowait()
-                            except queue.Empty:
-                                price_text = None
-                                self.add_log("WARNING", 
-                                    f"价格获取线程已完成但队列为空（耗时{elapsed_time:.1f}秒）", 
-                                    "monitor")
-                        
+
                         if not price_text:
                             # 如果价格获取失败，记录警告但继续发送通知
-                            self.add_log("WARNING", 
-                                f"价格获取失败或超时（耗时{elapsed_time:.1f}秒），通知中不包含价格信息", 
+                            elapsed_time = time.time() - start_time
+                            self.add_log("WARNING",
+                                f"价格获取失败或超时（耗时{elapsed_time:.1f}秒），通知中不包含价格信息",
                                 "monitor")
                     except Exception as e:
                         self.add_log("WARNING", f"价格获取过程异常: {str(e)}，发送不带价格的通知", "monitor")
-                        import traceback
                         self.add_log("WARNING", f"价格获取异常详情: {traceback.format_exc()}", "monitor")
                 
                 # 如果有价格信息，添加到消息中
                 if price_text:
-                    message += f"\n💰 价格: {price_text}\n"
+                    parts.append(f"\n💰 价格: {price_text}\n")
                 
-                message += f"状态: {status}\n"
-                message += f"时间: {self._now_beijing().strftime('%Y-%m-%d %H:%M:%S')}"
+                parts.append(f"状态: {status}\n")
+                parts.append(f"时间: {now_str}")
                 
                 # ✅ 如果有补货历时时间，添加到消息中
                 if duration_text:
                     duration_display = duration_text.replace("历时 ", "⏱️ 历时: ")
-                    message += f"\n{duration_display}"
+                    parts.append(f"\n{duration_display}")
                 
-                message += f"\n\n💡 快去抢购吧！"
+                parts.append("\n\n💡 快去抢购吧！")
             elif change_type == "price_check_failed":
                 # 价格校验失败通知：可用性有货但价格校验失败
-                message = f"📦 服务器可用性通知\n\n"
+                parts = ["📦 服务器可用性通知\n\n"]
                 
                 # 添加服务器名称（如果有）
                 if server_name:
-                    message += f"服务器: {server_name}\n"
+                    parts.append(f"服务器: {server_name}\n")
                 
-                message += f"型号: {plan_code}\n"
-                message += f"数据中心: {datacenter}\n"
+                parts.append(f"型号: {plan_code}\n")
+                parts.append(f"数据中心: {datacenter}\n")
                 
                 # 添加配置信息（如果有）
                 if config_info:
-                    message += (
+                    parts.append(
                         f"配置: {config_info['display']}\n"
                         f"├─ 内存: {config_info['memory']}\n"
                         f"└─ 存储: {config_info['storage']}\n"
@@ -1156,42 +1141,43 @@ class ServerMonitor:
                 if config_info and "cached_price" in config_info:
                     price_text = config_info.get("cached_price")
                     if price_text:
-                        message += f"\n💰 价格: {price_text}\n"
+                        parts.append(f"\n💰 价格: {price_text}\n")
                 
-                message += f"\n状态: 可用性显示有货\n"
-                message += f"时间: {self._now_beijing().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-                message += f"⚠️ 特别说明：\n"
+                parts.append("\n状态: 可用性显示有货\n")
+                parts.append(f"时间: {now_str}\n\n")
+                parts.append("⚠️ 特别说明：\n")
                 if price_check_error:
-                    message += f"（价格校验未通过: {price_check_error}，已跳过自动下单）"
+                    parts.append(f"（价格校验未通过: {price_check_error}，已跳过自动下单）")
                 else:
-                    message += f"（价格校验未通过，已跳过自动下单）"
+                    parts.append("（价格校验未通过，已跳过自动下单）")
             else:
                 # 基础消息
-                message = f"📦 服务器下架通知\n\n"
+                parts = ["📦 服务器下架通知\n\n"]
                 
                 # 添加服务器名称（如果有）
                 if server_name:
-                    message += f"服务器: {server_name}\n"
+                    parts.append(f"服务器: {server_name}\n")
                 
-                message += f"型号: {plan_code}\n"
+                parts.append(f"型号: {plan_code}\n")
                 
                 # 添加配置信息（如果有），使用与上架通知相同的树状格式
                 if config_info:
-                    message += (
+                    parts.append(
                         f"配置: {config_info['display']}\n"
                         f"├─ 内存: {config_info['memory']}\n"
                         f"└─ 存储: {config_info['storage']}\n"
                     )
                 
-                message += f"\n数据中心: {datacenter}\n"
-                message += f"状态: 已无货\n"
-                message += f"⏰ 时间: {self._now_beijing().strftime('%Y-%m-%d %H:%M:%S')}"
+                parts.append(f"\n数据中心: {datacenter}\n")
+                parts.append("状态: 已无货\n")
+                parts.append(f"⏰ 时间: {now_str}")
                 # 若可用，追加"从有货到无货历时多久"，格式与时间保持一致
                 if duration_text:
                     # duration_text 格式为 "历时 xxx"，改为 "⏱️ 历时: xxx" 以保持样式一致
                     duration_display = duration_text.replace("历时 ", "⏱️ 历时: ")
-                    message += f"\n{duration_display}"
+                    parts.append(f"\n{duration_display}")
             
+            message = "".join(parts)
             config_desc = f" [{config_info['display']}]" if config_info else ""
             self.add_log("INFO", f"正在发送Telegram通知: {plan_code}@{datacenter}{config_desc}", "monitor")
             result = self.send_notification(message)
@@ -1228,8 +1214,6 @@ class ServerMonitor:
                     options = config_info['options']
             
             # 使用HTTP请求调用内部价格API进行价格校验
-            import requests
-            
             # 调用内部API端点
             api_url = "http://127.0.0.1:19998/api/internal/monitor/price"
             payload = {
@@ -1239,7 +1223,7 @@ class ServerMonitor:
             }
             
             try:
-                response = requests.post(api_url, json=payload, timeout=20)  # 价格校验超时设置为20秒
+                response = self._http_session.post(api_url, json=payload, timeout=20)  # 价格校验超时设置为20秒
                 response.raise_for_status()
                 result = response.json()
             except requests.exceptions.Timeout:
@@ -1281,7 +1265,7 @@ class ServerMonitor:
                 return False, error_msg
             
             # 价格校验通过
-            self.add_log("DEBUG", f"价格校验通过: {plan_code}@{datacenter} - 含税价格: {with_tax}", "monitor")
+            self._log("DEBUG", "价格校验通过: %s@%s - 含税价格: %s", plan_code, datacenter, with_tax)
             return True, None
                 
         except Exception as e:
@@ -1309,12 +1293,18 @@ class ServerMonitor:
                 # 如果config_info中已经有options字段（API2格式），直接使用
                 if 'options' in config_info and config_info['options']:
                     options = config_info['options']
-            
-            # 实时查询价格（不使用缓存）
+
+            # 短TTL价格缓存：同配置组合在TTL内重复查询直接返回
+            # （单次dict读写在GIL下原子，无需加锁）
+            cache_key = (plan_code, datacenter, tuple(sorted(map(str, options))))
+            cached = self._price_cache.get(cache_key)
+            if cached and time.time() - cached[1] < self._price_cache_ttl:
+                self._log("DEBUG", "价格缓存命中: %s (%s@%s)", cached[0], plan_code, datacenter)
+                return cached[0]
+
+            # 缓存未命中，实时查询价格
             # 使用HTTP请求调用内部价格API（确保在正确的上下文访问配置）
-            import requests
-            
-            self.add_log("DEBUG", f"开始获取价格: plan_code={plan_code}, datacenter={datacenter}, options={options}", "monitor")
+            self._log("DEBUG", "开始获取价格: plan_code=%s, datacenter=%s, options=%s", plan_code, datacenter, options)
             
             # 调用内部API端点
             api_url = "http://127.0.0.1:19998/api/internal/monitor/price"
@@ -1325,7 +1315,7 @@ class ServerMonitor:
             }
             
             try:
-                response = requests.post(api_url, json=payload, timeout=30)
+                response = self._http_session.post(api_url, json=payload, timeout=30)
                 response.raise_for_status()
                 result = response.json()
             except requests.exceptions.RequestException as e:
@@ -1342,8 +1332,10 @@ class ServerMonitor:
                     # 格式化价格
                     currency_symbol = "€" if currency == "EUR" else "$" if currency == "USD" else currency
                     price_text = f"{currency_symbol}{with_tax:.2f}/月"
-                    self.add_log("DEBUG", f"价格获取成功: {price_text}", "monitor")
-                    
+                    self._log("DEBUG", "价格获取成功: %s", price_text)
+
+                    # 写入价格缓存（带条目数上限）
+                    self._cache_put(self._price_cache, cache_key, (price_text, time.time()))
                     return price_text
                 else:
                     self.add_log("WARNING", f"价格获取成功但withTax为None: result={result}", "monitor")
@@ -1355,7 +1347,6 @@ class ServerMonitor:
                 
         except Exception as e:
             self.add_log("WARNING", f"获取价格信息时出错: {str(e)}", "monitor")
-            import traceback
             self.add_log("WARNING", f"价格获取异常堆栈: {traceback.format_exc()}", "monitor")
             return None
     
@@ -1367,25 +1358,24 @@ class ServerMonitor:
             current_server_list: 当前服务器列表
         """
         try:
-            current_codes = {s.get("planCode") for s in current_server_list if s.get("planCode")}
-            
+            # 一次建立 planCode -> 服务器 映射：新服务器查找为O(1)，免去逐个线性扫描
+            current_map = {s["planCode"]: s for s in current_server_list if s.get("planCode")}
+
             # 首次运行，初始化已知服务器
             if not self.known_servers:
-                self.known_servers = current_codes
-                self.add_log("INFO", f"初始化已知服务器列表: {len(current_codes)} 台", "monitor")
+                self.known_servers = set(current_map.keys())
+                self.add_log("INFO", f"初始化已知服务器列表: {len(current_map)} 台", "monitor")
                 return
-            
+
             # 找出新服务器
-            new_servers = current_codes - self.known_servers
-            
+            new_servers = current_map.keys() - self.known_servers
+
             if new_servers:
                 for server_code in new_servers:
-                    server = next((s for s in current_server_list if s.get("planCode") == server_code), None)
-                    if server:
-                        self.send_new_server_alert(server)
+                    self.send_new_server_alert(current_map[server_code])
                 
                 # 更新已知服务器列表
-                self.known_servers = current_codes
+                self.known_servers = set(current_map.keys())
                 self.add_log("INFO", f"检测到 {len(new_servers)} 台新服务器上架", "monitor")
         
         except Exception as e:
@@ -1415,31 +1405,27 @@ class ServerMonitor:
     def _cleanup_expired_caches(self):
         """清理过期的缓存项（UUID和options缓存）- 线程安全"""
         current_time = time.time()
-        expired_uuids = []
-        expired_options_keys = []
-        
+
         # ✅ 使用锁保护缓存操作
+        # 单遍遍历、命中即pop（不再先收集过期key列表再二次遍历删除）
+        # 注意：写入方不持锁（单次dict写入在GIL下原子），因此仍需items()快照防
+        # 遍历中并发插入，也不能整体重建dict（重建会丢失期间的并发写入）
         with self._cache_lock:
-            # 清理过期的UUID缓存
+            expired_uuids = 0
             for uuid_key, cache_data in list(self.message_uuid_cache.items()):
-                cache_timestamp = cache_data.get("timestamp", 0)
-                if current_time - cache_timestamp >= self.message_uuid_cache_ttl:
-                    expired_uuids.append(uuid_key)
-            
-            for uuid_key in expired_uuids:
-                del self.message_uuid_cache[uuid_key]
-            
-            # 清理过期的options缓存
+                if current_time - cache_data.get("timestamp", 0) >= self.message_uuid_cache_ttl:
+                    # pop带默认值：条目可能已被容量淘汰（_cache_put）并发移除
+                    self.message_uuid_cache.pop(uuid_key, None)
+                    expired_uuids += 1
+
+            expired_options_keys = 0
             for options_key, cache_data in list(self.options_cache.items()):
-                cache_timestamp = cache_data.get("timestamp", 0)
-                if current_time - cache_timestamp >= self.options_cache_ttl:
-                    expired_options_keys.append(options_key)
-            
-            for options_key in expired_options_keys:
-                del self.options_cache[options_key]
-        
+                if current_time - cache_data.get("timestamp", 0) >= self.options_cache_ttl:
+                    self.options_cache.pop(options_key, None)
+                    expired_options_keys += 1
+
         if expired_uuids or expired_options_keys:
-            self.add_log("DEBUG", f"清理过期缓存: UUID={len(expired_uuids)}个, Options={len(expired_options_keys)}个", "monitor")
+            self._log("DEBUG", "清理过期缓存: UUID=%s个, Options=%s个", expired_uuids, expired_options_keys)
     
     def monitor_loop(self):
         """监控主循环"""
@@ -1454,17 +1440,23 @@ class ServerMonitor:
                 if self.subscriptions:
                     self.add_log("INFO", f"开始检查 {len(self.subscriptions)} 个订阅...", "monitor")
                     
-                    # ✅ 创建副本避免在遍历时修改列表导致的竞态条件
-                    subscriptions_copy = list(self.subscriptions)
+                    # ✅ 创建副本避免在遍历时修改字典导致的竞态条件
+                    subscriptions_copy = list(self.subscriptions.values())
+                    # 并发提交各订阅的检查任务：单轮耗时由最慢的订阅决定，而非逐个串行累加
+                    check_futures = []
                     for subscription in subscriptions_copy:
                         if not self.running:  # 检查是否被停止
                             break
-                        # 再次检查订阅是否仍在列表中（可能在遍历期间被删除）
-                        if subscription not in self.subscriptions:
+                        # 再次检查订阅是否仍然存在（可能在遍历期间被删除）
+                        if subscription.get("planCode") not in self.subscriptions:
                             self.add_log("DEBUG", f"订阅 {subscription.get('planCode')} 在检查期间被删除，跳过", "monitor")
                             continue
-                        self.check_availability_change(subscription)
-                        time.sleep(1)  # 避免请求过快
+                        check_futures.append(
+                            self._check_pool.submit(self.check_availability_change, subscription)
+                        )
+                    # 等待本轮所有检查完成（check_availability_change 内部自行捕获异常）
+                    if check_futures:
+                        concurrent.futures.wait(check_futures)
                 else:
                     self.add_log("INFO", "当前无订阅，跳过检查", "monitor")
                 
@@ -1480,11 +1472,9 @@ class ServerMonitor:
             if self.running:
                 current_interval = self.check_interval  # 在循环开始前读取当前值
                 self.add_log("INFO", f"等待 {current_interval} 秒后进行下次检查...", "monitor")
-                # 分段sleep，每秒检查一次running状态，实现快速停止
-                for _ in range(current_interval):
-                    if not self.running:
-                        break
-                    time.sleep(1)
+                # 一次性等待整个间隔；stop() 置位事件后立即被唤醒，无需每秒轮询
+                if self._stop_event.wait(timeout=current_interval):
+                    break
         
         self.add_log("INFO", "监控循环已停止", "monitor")
     
@@ -1494,6 +1484,12 @@ class ServerMonitor:
             self.add_log("WARNING", "监控已在运行中", "monitor")
             return False
         
+        # 若线程池已在 stop() 中关闭，重新创建
+        if self._pools_closed:
+            self._create_pools()
+            self._pools_closed = False
+
+        self._stop_event.clear()
         self.running = True
         self.thread = threading.Thread(target=self.monitor_loop, daemon=True)
         self.thread.start()
@@ -1508,12 +1504,18 @@ class ServerMonitor:
             return False
         
         self.running = False
+        self._stop_event.set()  # 唤醒正在等待间隔的监控线程
         self.add_log("INFO", "正在停止服务器监控...", "monitor")
-        
-        # 等待线程结束（最多等待3秒，因为已优化为1秒检查一次）
+
+        # 等待线程结束（最多等待3秒，等待间隔会被stop事件立即打断）
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=3)
-        
+
+        # 关闭线程池（不等待在途任务），start() 时重建
+        self._price_pool.shutdown(wait=False)
+        self._check_pool.shutdown(wait=False)
+        self._pools_closed = True
+
         self.add_log("INFO", "服务器监控已停止", "monitor")
         return True
     
@@ -1524,7 +1526,7 @@ class ServerMonitor:
             "subscriptions_count": len(self.subscriptions),
             "known_servers_count": len(self.known_servers),
             "check_interval": self.check_interval,
-            "subscriptions": self.subscriptions
+            "subscriptions": self.subscriptions_list
         }
     
     def set_check_interval(self, interval):